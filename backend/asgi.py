@@ -0,0 +1,69 @@
+"""ASGI entry point, for serving many concurrent long-lived connections.
+
+Run from the repository root:
+    uvicorn backend.asgi:application --host 0.0.0.0 --port 5050
+
+Requests run the Flask app in a pool of ASGI_THREADS threads, so handlers,
+their database sessions and the connection pool behave exactly as under
+gunicorn (backend.app:app remains the WSGI entry point). What the event
+loop takes over is waiting: idle keep-alive connections, slow clients and
+/api/validation-events subscribers cost no thread while they wait, where
+under WSGI each one occupies a worker or worker thread.
+"""
+import asyncio
+import io
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from backend.app import app
+from backend.geoproof.validation import ValidationEventStream
+
+wsgi_application = WSGIMiddleware(app, workers=app.config['ASGI_THREADS'])
+
+def dispatch(scope):
+    # Routing, request hooks, CORS and the response headers stay Flask's;
+    # only an event stream body is left for the event loop to send
+    environ = build_environ(scope, io.BytesIO())
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            response = app.handle_exception(e)
+        body = response.response
+        if not isinstance(body, ValidationEventStream):
+            body = [response.get_data()]
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+        return response.status_code, headers, body
+
+async def send_event_stream(body, send):
+    async for chunk in body:
+        await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def validation_events(scope, receive, send):
+    status, headers, body = await asyncio.get_running_loop().run_in_executor(
+        wsgi_application.executor, dispatch, scope
+    )
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    if not isinstance(body, ValidationEventStream):
+        await send({'type': 'http.response.body', 'body': b''.join(body)})
+        return
+
+    # Stream until the client goes away; servers don't fail sends after a disconnect
+    tasks = [asyncio.ensure_future(send_event_stream(body, send)), asyncio.ensure_future(wait_for_disconnect(receive))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+    for task in done:
+        task.result() # Re-raise send errors
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/api/validation-events' and scope['method'] == 'GET':
+        await validation_events(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Per-request cost of authentication, with and without the verified-token cache.
+
+Sends authenticated requests to cheap endpoints and reports the mean
+latency and the number of SQL statements each one issues. The "uncached"
+run clears `verified_tokens` and `collection_addresses` before every
+request, so each request decodes the JWT and looks the user up again, as
+the routes did before the request-scoped auth layer; the "cached" run
+keeps them warm. It then times a revocation check against a denylist of
+REVOKED logged-out tokens.
+
+Run from the repository root:
+    python -m backend.benchmarks.auth_overhead
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from sqlalchemy import event
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.auth import create_token, collection_addresses, token_denylist, verified_tokens
+from backend.geoproof.models import RevokedToken, User, Device
+
+REQUESTS = 2000
+REVOKED = 100000
+ENDPOINTS = ['/api/my-rating/dev0', '/api/my-transactions']
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    user = User(username='user', password_hash='x', collection_address='user-collection')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Device(id='dev0', user_id=user.id, name='dev0', hashed_device_key='key'))
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_token(user.id)}'}
+
+def measure(client, url, auth, cached):
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    elapsed = 0.0
+    with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+        for _ in range(REQUESTS):
+            if not cached:
+                verified_tokens.clear()
+                collection_addresses.clear()
+            start = time.perf_counter()
+            response = client.get(url, headers=auth)
+            response.get_data()
+            elapsed += time.perf_counter() - start
+            assert response.status_code < 500, f"{url}: {response.status_code}"
+    event.remove(db.engine, 'before_cursor_execute', count_statement)
+    return elapsed / REQUESTS * 1e6, statements / REQUESTS
+
+def run():
+    client = app.test_client()
+    with app.app_context():
+        auth = seed()
+        print(f"{REQUESTS} requests per endpoint")
+        print(f"{'endpoint':<24} {'mode':>9} {'us/req':>9} {'SQL/req':>8}")
+        for url in ENDPOINTS:
+            for mode in ('uncached', 'cached'):
+                micros, statements = measure(client, url, auth, cached=mode == 'cached')
+                print(f"{url:<24} {mode:>9} {micros:>9.1f} {statements:>8.1f}")
+
+        expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+        db.session.execute(db.insert(RevokedToken), [
+            {'jti': uuid.uuid4().hex, 'expires_at': expires_at} for _ in range(REVOKED)
+        ])
+        db.session.commit()
+        start = time.perf_counter()
+        token_denylist.refresh()
+        print(f"Loaded {REVOKED} revoked tokens in {(time.perf_counter() - start) * 1000:.1f} ms")
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            token_denylist.is_revoked(uuid.uuid4().hex)
+        print(f"Revocation check: {(time.perf_counter() - start) / REQUESTS * 1e6:.2f} us")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,15 @@
+"""Scan codes as a device's QR encodes them, for the benchmarks.
+
+Mirrors what the ESP32 firmware does (see backend/esp32/): the TOTP and
+location, AES-CBC encrypted with the device secret under a random IV.
+"""
+import base64
+import os
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+def encrypt_code(secret, plain_text):
+    key = secret.encode('utf-8').ljust(32, b'\0')[:32]
+    iv = os.urandom(16)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    return base64.urlsafe_b64encode(iv + cipher.encrypt(pad(plain_text.encode('utf-8'), AES.block_size))).decode('utf-8')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Show that unchanged polls of the public read endpoints are answered with 304.
+
+For each endpoint the script polls once, repeats the poll with the
+returned ETag, then writes to the underlying data and polls again. It
+prints the status and SQL statement count of each poll: a 304 costs a
+single data_version lookup, whatever the size of the data behind it.
+
+Run from the repository root:
+    python -m backend.benchmarks.conditional_get
+"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from sqlalchemy import event
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.models import User, Device, Rating
+
+DEVICE_COUNT = 500
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    owner = User(username='owner', password_hash='x', collection_address='owner-collection')
+    db.session.add(owner)
+    db.session.flush()
+    for i in range(DEVICE_COUNT):
+        db.session.add(Device(id=f'dev{i}', user_id=owner.id, name=f'dev{i}', hashed_device_key='key',
+                              latitude=48.0, longitude=16.0, rating_sum=5, rating_count=1))
+        db.session.add(Rating(device_id=f'dev{i}', user_id=owner.id, rating=5))
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_token(owner.id)}'}
+
+def run():
+    client = app.test_client()
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def poll(url, etag=None):
+        statements.clear()
+        response = client.get(url, headers={'If-None-Match': etag} if etag else {})
+        return response, len(statements)
+
+    with app.app_context():
+        auth = seed()
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        writes = {
+            '/api/devices': lambda: client.put('/api/devices/dev1', headers=auth, json={'name': 'renamed'}),
+            '/api/devices/dev0': lambda: client.put('/api/devices/dev0', headers=auth, json={'name': 'renamed'}),
+            '/api/ratings/dev0': lambda: client.post('/api/ratings/dev0', headers=auth, json={'rating': 3}),
+            '/api/users/owner': lambda: client.put('/api/profile', headers=auth, json={'bio': 'updated'}),
+        }
+        print(f"{'endpoint':<20} {'first':>10} {'unchanged':>12} {'after write':>12}")
+        for url, write in writes.items():
+            first, first_count = poll(url)
+            unchanged, unchanged_count = poll(url, first.headers['ETag'])
+            write()
+            changed, changed_count = poll(url, first.headers['ETag'])
+            assert (first.status_code, unchanged.status_code, changed.status_code) == (200, 304, 200)
+            print(f"{url:<20} {f'200/{first_count}q':>10} {f'304/{unchanged_count}q':>12} {f'200/{changed_count}q':>12}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Concurrent connections one server process holds, WSGI versus ASGI.
+
+Starts the app under gunicorn (one gthread worker with WSGI_THREADS
+threads, the WSGI entry point) and under uvicorn (one process, the ASGI
+entry point), opens CONNECTIONS idle /api/validation-events subscriptions
+against each, and counts how many are answered. While they stay open it
+sends PROBES concurrent GET /api/devices requests, to show whether the
+server still serves other clients.
+
+Run from the repository root:
+    python -m backend.benchmarks.connection_capacity
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from backend.app import app
+from backend.geoproof import db
+
+CONNECTIONS = 2000
+WSGI_THREADS = 32
+PROBES = 20
+TIMEOUT = 5 # Seconds to wait for a response
+PORT = 5099
+
+SERVERS = {
+    'wsgi': ['gunicorn', '--workers', '1', '--worker-class', 'gthread', '--threads', str(WSGI_THREADS),
+             '--bind', f'127.0.0.1:{PORT}', 'backend.app:app'],
+    'asgi': ['uvicorn', '--host', '127.0.0.1', '--port', str(PORT), '--log-level', 'warning',
+             'backend.asgi:application'],
+}
+
+def start_server(command):
+    server = subprocess.Popen([sys.executable, '-m'] + command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{command[0]} did not start")
+
+async def request(path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    return reader, writer
+
+async def subscribe():
+    # Returns the open connection once the server has answered, else None
+    try:
+        reader, writer = await asyncio.wait_for(request('/api/validation-events'), TIMEOUT)
+        status = await asyncio.wait_for(reader.readline(), TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    if b' 200 ' not in status:
+        writer.close()
+        return None
+    return writer
+
+async def probe():
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(request('/api/devices'), TIMEOUT)
+        status = await asyncio.wait_for(reader.readline(), TIMEOUT)
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    return time.perf_counter() - start if b' 200 ' in status else None
+
+async def measure():
+    subscriptions = await asyncio.gather(*[subscribe() for _ in range(CONNECTIONS)])
+    latencies = await asyncio.gather(*[probe() for _ in range(PROBES)])
+    for writer in subscriptions:
+        if writer is not None:
+            writer.close()
+    answered = [latency for latency in latencies if latency is not None]
+    return sum(1 for writer in subscriptions if writer is not None), answered
+
+def run():
+    with app.app_context():
+        db.create_all()
+    print(f"{CONNECTIONS} event stream subscribers, then {PROBES} GET /api/devices")
+    print(f"{'server':>6} {'subscribed':>11} {'probes ok':>10} {'median ms':>10}")
+    for name, command in SERVERS.items():
+        server = start_server(command)
+        try:
+            subscribed, latencies = asyncio.run(measure())
+        finally:
+            server.terminate()
+            server.wait()
+        median = f"{statistics.median(latencies) * 1000:.1f}" if latencies else '-'
+        print(f"{name:>6} {subscribed:>11} {len(latencies):>10} {median:>10}")
+
+if __name__ == '__main__':
+    run()
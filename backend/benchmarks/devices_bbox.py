@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare geohash bounding-box queries with a full device scan.
+
+Seeds 100k devices spread over Europe, then times a city-sized viewport
+through the geohash index against loading every device and filtering in
+Python (what the map did before ?bbox=).
+
+Run from the repository root:
+    python -m backend.benchmarks.devices_bbox
+"""
+import os
+import random
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.devices import filter_devices_in_bbox
+from backend.geoproof.models import User, Device, encode_geohash
+
+DEVICE_COUNT = 100_000
+REPEAT = 5
+# (west, south, east, north) viewports
+VIEWPORTS = {
+    'city': (16.2, 48.1, 16.5, 48.3),
+    'region': (14.0, 47.0, 17.0, 49.0),
+}
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    owner = User(username='owner', password_hash='x')
+    db.session.add(owner)
+    db.session.flush()
+    rng = random.Random(42)
+    rows = []
+    for i in range(DEVICE_COUNT):
+        latitude, longitude = rng.uniform(36.0, 60.0), rng.uniform(-10.0, 30.0)
+        rows.append({
+            'id': f'dev{i}', 'user_id': owner.id, 'name': f'dev{i}', 'hashed_device_key': 'key',
+            'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)
+        })
+    db.session.execute(Device.__table__.insert(), rows)
+    db.session.commit()
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+def run():
+    client = app.test_client()
+    with app.app_context():
+        seed()
+        print(f"{DEVICE_COUNT} devices, mean of {REPEAT} runs")
+        print(f"{'viewport':>8} {'rows':>6} {'scan ms':>9} {'bbox ms':>9} {'api scan ms':>12} {'api bbox ms':>12}")
+        for name, (west, south, east, north) in VIEWPORTS.items():
+            def full_scan():
+                return [d for d in Device.query.all()
+                        if south <= d.latitude <= north and west <= d.longitude <= east]
+
+            def bbox_query():
+                return filter_devices_in_bbox(Device.query, south, west, north, east).all()
+
+            scan_ms, scanned = timed(full_scan)
+            db.session.expunge_all()
+            bbox_ms, matched = timed(bbox_query)
+            db.session.expunge_all()
+            assert {d.id for d in scanned} == {d.id for d in matched}
+
+            start = time.perf_counter()
+            assert client.get('/api/devices').status_code == 200
+            api_scan_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            response = client.get('/api/devices', query_string={'bbox': f'{west},{south},{east},{north}'})
+            api_bbox_ms = (time.perf_counter() - start) * 1000
+            assert len(response.get_json()) == len(matched)
+
+            print(f"{name:>8} {len(matched):>6} {scan_ms:>9.1f} {bbox_ms:>9.1f} {api_scan_ms:>12.1f} {api_bbox_ms:>12.1f}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Count the SQL statements issued by GET /api/devices as the device table grows.
+
+Run from the repository root:
+    python -m backend.benchmarks.devices_query_count
+"""
+import os
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from sqlalchemy import event
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.caching import response_cache
+from backend.geoproof.models import User, Device, Validation, Rating
+
+# Each count must come from the database, not from the previous seed's cached response
+app.config['RESPONSE_CACHE_BACKEND'] = 'null'
+response_cache.init_app(app)
+
+DEVICE_COUNTS = [10, 100, 1000, 5000]
+
+def seed(device_count):
+    db.drop_all()
+    db.create_all()
+    owner = User(username='owner', password_hash='x', collection_address='owner-collection')
+    db.session.add(owner)
+    db.session.flush()
+    for i in range(device_count):
+        device_id = f'dev{i}'
+        db.session.add(Device(id=device_id, user_id=owner.id, name=device_id,
+                              hashed_device_key='key', latitude=48.0, longitude=16.0,
+                              rating_sum=5, rating_count=1))
+        db.session.add(Rating(device_id=device_id, user_id=owner.id, rating=5))
+        for _ in range(4):
+            db.session.add(Validation(device_id=device_id, user_id=owner.id, status='success'))
+    db.session.commit()
+
+def run():
+    client = app.test_client()
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        print(f"{'devices':>8} {'queries':>8} {'seconds':>8}")
+        for device_count in DEVICE_COUNTS:
+            seed(device_count)
+            db.session.remove()
+            event.listen(db.engine, 'before_cursor_execute', count_statement)
+            statements.clear()
+            start = time.perf_counter()
+            response = client.get('/api/devices')
+            elapsed = time.perf_counter() - start
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+            assert response.status_code == 200
+            assert len(response.get_json()) == device_count
+            print(f"{device_count:>8} {len(statements):>8} {elapsed:>8.3f}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Import time of the backend's entry points, against a budget.
+
+Runs each entry point in a fresh interpreter under `python -X importtime`,
+after importing what every entry point needs (FRAMEWORK: Flask,
+Flask-SQLAlchemy, ...), and adds up the time spent on the imports that
+follow, best of RUNS, so the budgets cover what the backend adds rather
+than how fast this machine imports SQLAlchemy. Modules the app loads on
+first use (LAZY_MODULES) must not be imported at all. Exits with status 1
+when anything is over budget, so it can run in CI.
+
+Run from the repository root:
+    python -m backend.benchmarks.import_time
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENV = {**os.environ, 'DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"}
+
+FRAMEWORK = 'import flask, flask_sqlalchemy, flask_cors, dotenv'
+# Entry point -> (code, budget in ms on top of FRAMEWORK)
+CASES = {
+    'worker': ('import backend.app', 150), # What gunicorn/uvicorn load
+    'tools': ('from backend.geoproof import create_app; create_app(views=False)', 75), # update_db, empty_auth_db
+}
+LAZY_MODULES = ('jwt', 'pyotp', 'Crypto', 'alembic', 'flask_migrate')
+RUNS = 5
+
+IMPORT_TIME = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$')
+MARKER = 'framework imported'
+
+def import_profile(code):
+    """Import time in ms of `code` once FRAMEWORK is imported, in a new interpreter, and the modules it imported."""
+    script = f"{FRAMEWORK}\nimport sys\nsys.stderr.write('{MARKER}\\n')\n{code}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=REPOSITORY_ROOT, env=ENV,
+                            capture_output=True, text=True, check=True)
+    output = result.stderr.splitlines()
+    total = 0
+    modules = set()
+    for line in output[output.index(MARKER) + 1:]:
+        match = IMPORT_TIME.match(line)
+        if match:
+            modules.add(match.group(3).split('.')[0])
+            if not match.group(2): # Top-level imports; nested ones are part of their cumulative time
+                total += int(match.group(1))
+    return total / 1000, modules
+
+def best_profile(code):
+    profiles = [import_profile(code) for _ in range(RUNS)]
+    return min(total for total, _ in profiles), set.union(*(modules for _, modules in profiles))
+
+def run():
+    print(f"Import time after {FRAMEWORK!r}, best of {RUNS} runs")
+    print(f"{'entry point':>12} {'ms':>7} {'budget':>7}")
+    failures = []
+    for name, (code, budget) in CASES.items():
+        total, modules = best_profile(code)
+        print(f"{name:>12} {total:>7.1f} {budget:>7}")
+        if total > budget:
+            failures.append(f"{name}: {total:.1f} ms of imports, budget {budget} ms")
+        eager = [module for module in LAZY_MODULES if module in modules]
+        if eager:
+            failures.append(f"{name}: imports {', '.join(eager)}, which should load on first use")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    run()
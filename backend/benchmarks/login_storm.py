@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Validation latency in one worker while it is flooded with logins.
+
+A scanner thread validates codes back to back and records each request's
+latency while LOGIN_THREADS threads post logins as fast as they can, like
+a gthread worker serving both. The "inline" run gives the password pool
+one worker per login thread, so every login hashes at once as when
+hashing ran on the request thread; the "pooled" run uses the configured
+PASSWORD_HASH_WORKERS. Login rate limits are lifted, to measure the pool
+alone; logins beyond PASSWORD_HASH_QUEUE_SIZE are answered with 503.
+
+Run from the repository root:
+    python -m backend.benchmarks.login_storm
+"""
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+import pyotp
+from backend.app import app
+from backend.benchmarks.codes import encrypt_code
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.counters import MemoryCounterBackend, rate_limiter
+from backend.geoproof.models import User, Device
+from backend.geoproof.passwords import password_hasher
+from backend.geoproof.validation import replay_guard
+
+LOGIN_THREADS = 8
+DURATION = 5 # Seconds per run
+DEVICE_COUNT = 5000 # Each code is accepted once, so every validation uses a fresh device
+SECRET = 'N6OYKIG65RETZ4NI'
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    scanner = User(username='scanner', password_hash='x', collection_address='scanner-collection')
+    db.session.add(scanner)
+    for i in range(LOGIN_THREADS):
+        user = User(username=f'user{i}', collection_address=f'user{i}-collection')
+        user.set_password('password')
+        db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        Device(id=f'dev{i}', user_id=scanner.id, name=f'dev{i}', hashed_device_key='key',
+               secret=SECRET, device_address=f'dev{i}-address')
+        for i in range(DEVICE_COUNT)
+    ])
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_token(scanner.id)}'}
+
+def scan(client, auth, deadline, latencies):
+    totp = pyotp.TOTP(SECRET)
+    with app.app_context():
+        for i in range(DEVICE_COUNT):
+            if time.time() >= deadline:
+                break
+            url = f'/api/validate/dev{i}/{encrypt_code(SECRET, f"{totp.now()}|48.2|16.3")}'
+            start = time.perf_counter()
+            response = client.get(url, headers=auth)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+
+def log_in(client, username, deadline, statuses):
+    while time.time() < deadline:
+        status = client.post('/api/login', json={'username': username, 'password': 'password'}).status_code
+        statuses[status] = statuses.get(status, 0) + 1
+
+def run_profile(client, auth, hash_workers, storm):
+    app.config['PASSWORD_HASH_WORKERS'] = hash_workers
+    password_hasher.init_app(app)
+    replay_guard.backend = MemoryCounterBackend()
+    rate_limiter.backend = MemoryCounterBackend()
+    rate_limiter.user_limit = DEVICE_COUNT
+    rate_limiter.login_username_limit = rate_limiter.login_address_limit = 10 ** 9
+
+    latencies, statuses = [], {}
+    deadline = time.time() + DURATION
+    threads = [threading.Thread(target=scan, args=(client, auth, deadline, latencies))]
+    if storm:
+        threads += [threading.Thread(target=log_in, args=(client, f'user{i}', deadline, statuses))
+                    for i in range(LOGIN_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+def run():
+    client = app.test_client()
+    pooled_workers = app.config['PASSWORD_HASH_WORKERS']
+    with app.app_context():
+        auth = seed()
+    print(f"{LOGIN_THREADS} login threads, {DURATION}s per run, {os.cpu_count()} CPU(s)")
+    print(f"{'run':>8} {'p50 ms':>8} {'p95 ms':>8} {'validations':>12} {'logins':>7} {'503s':>5}")
+    with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+        results = [
+            ('idle', run_profile(client, auth, pooled_workers, storm=False)),
+            ('inline', run_profile(client, auth, LOGIN_THREADS, storm=True)),
+            ('pooled', run_profile(client, auth, pooled_workers, storm=True)),
+        ]
+    for name, (latencies, statuses) in results:
+        quantiles = statistics.quantiles(latencies, n=20)
+        print(f"{name:>8} {quantiles[9] * 1000:>8.2f} {quantiles[18] * 1000:>8.2f} {len(latencies):>12} "
+              f"{statuses.get(200, 0):>7} {statuses.get(503, 0):>5}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Flag full table scans in the queries the API endpoints issue.
+
+Calls every endpoint once against a small seeded SQLite database, records
+each SELECT/UPDATE/DELETE it sends, and runs EXPLAIN QUERY PLAN on it. A
+plan step that scans a table without an index (`SCAN <table>`) is
+reported, unless the endpoint lists the whole table by design (see
+EXPECTED_SCANS). Exits with status 1 when anything is flagged, so it can
+run in CI.
+
+Run from the repository root:
+    python -m backend.benchmarks.query_plans
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+import pyotp
+from sqlalchemy import event
+from backend.app import app
+from backend.benchmarks.codes import encrypt_code
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.models import User, Device, Validation, Rating, Transaction, record_token_transactions
+
+SECRET = 'N6OYKIG65RETZ4NI'
+
+# (endpoint, table) pairs that read every row on purpose
+EXPECTED_SCANS = {
+    ('GET /api/devices', 'device'), # The full device list
+}
+
+SCAN = re.compile(r'^SCAN (\w+)(?! USING (?:COVERING )?INDEX)')
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    owner = User(username='owner', password_hash='x', collection_address='owner-collection')
+    other = User(username='other', password_hash='x', collection_address='other-collection')
+    db.session.add_all([owner, other])
+    db.session.flush()
+    for i in range(20):
+        device_id = f'dev{i}'
+        db.session.add(Device(id=device_id, user_id=owner.id, name=device_id, hashed_device_key='key',
+                              secret=SECRET, device_address=f'{device_id}-address',
+                              latitude=48.0 + i / 100, longitude=16.0 + i / 100, rating_sum=5, rating_count=1))
+        db.session.add(Rating(device_id=device_id, user_id=owner.id, rating=5))
+        validation = Validation(device_id=device_id, user_id=owner.id, status='success')
+        db.session.add(validation)
+        db.session.flush()
+        mint = Transaction(validation_id=validation.id, token_address=f'token{i}', sender=f'{device_id}-address',
+                           receiver=owner.collection_address, status='mint')
+        db.session.add(mint)
+        record_token_transactions([mint])
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_token(owner.id)}'}
+
+def requests(auth):
+    totp = pyotp.TOTP(SECRET)
+    code = lambda device_id: f'{device_id}/{encrypt_code(SECRET, f"{totp.now()}|48.0|16.0")}'
+    return [
+        ('GET', '/api/devices', None),
+        ('GET', '/api/devices?bbox=15.9,47.9,16.1,48.1', None),
+        ('GET', '/api/devices?near=48.0,16.0&radius=1000', None),
+        ('GET', '/api/my-devices', None),
+        ('GET', '/api/devices/dev1', None),
+        ('GET', '/api/device-clusters/12/2230/1420', None),
+        ('GET', '/api/device-clusters/3/4/2', None),
+        ('GET', f'/api/validate/{code("dev1")}', None),
+        ('POST', '/api/validate/batch', {'codes': [code('dev2'), code('dev3')]}),
+        ('GET', '/api/validations/dev1', None),
+        ('GET', '/api/validations/dev1?limit=10', None),
+        ('GET', '/api/my-validations', None),
+        ('GET', '/api/all-validations?limit=10', None),
+        ('GET', '/api/my-transactions', None),
+        ('POST', '/api/send-token', {'recipient_address': 'other-collection', 'token_addresses': ['token1', 'token2']}),
+        ('POST', '/api/ratings/dev1', {'rating': 4}),
+        ('GET', '/api/ratings/dev1', None),
+        ('GET', '/api/my-rating/dev1', None),
+        ('GET', '/api/profile', None),
+        ('GET', '/api/users/owner', None),
+        ('GET', '/api/users/owner/validations', None),
+    ]
+
+def full_scans(connection, statement, parameters):
+    # Scans of subquery results and constant rows are not table scans
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    scanned = {match.group(1) for row in plan for match in [SCAN.match(row[-1])] if match}
+    return scanned & set(db.metadata.tables)
+
+def run():
+    client = app.test_client()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    flagged = 0
+    with app.app_context():
+        auth = seed()
+        for method, url, body in requests(auth):
+            endpoint = f"{method} {url[:60]}"
+            statements.clear()
+            event.listen(db.engine, 'before_cursor_execute', record_statement)
+            with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+                response = client.open(url, method=method, headers=auth, json=body)
+                response.get_data() # Drain streamed bodies
+            event.remove(db.engine, 'before_cursor_execute', record_statement)
+            assert response.status_code < 400, f"{endpoint}: {response.status_code}"
+
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    for table in sorted(full_scans(connection, statement, parameters)):
+                        if (endpoint.split('?')[0], table) in EXPECTED_SCANS:
+                            continue
+                        flagged += 1
+                        print(f"{endpoint}: full scan of {table}")
+                        print(f"    {' '.join(statement.split())[:300]}")
+    if flagged:
+        print(f"{flagged} full table scan(s)")
+        sys.exit(1)
+    print('No unexpected full table scans')
+
+if __name__ == '__main__':
+    run()
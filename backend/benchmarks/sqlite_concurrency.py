@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Concurrent read/write throughput on SQLite, with and without the tuned pragmas.
+
+Forks reader processes polling GET /api/my-validations and writer
+processes submitting ratings, like gunicorn workers sharing one database
+file, and counts completed and failed requests over a fixed duration.
+The "default" run uses SQLite's stock rollback journal (journal_mode
+DELETE, synchronous FULL, no busy_timeout beyond the driver's); the
+"tuned" run uses the SQLITE_* settings from geoproof/settings.py.
+
+Run from the repository root:
+    python -m backend.benchmarks.sqlite_concurrency
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+_db_path = os.path.join(_tmp_dir, 'bench.db')
+os.environ['DATABASE_URI'] = f"sqlite:///{_db_path}"
+
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.models import User, Device, Validation
+
+READERS = 4
+WRITERS = 2
+DURATION = 5 # Seconds per run
+DEVICE_COUNT = 50
+
+PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT': None,
+        'SQLITE_CACHE_SIZE': None,
+        'SQLITE_MMAP_SIZE': None,
+    },
+    'tuned': {name: app.config[name] for name in (
+        'SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT', 'SQLITE_CACHE_SIZE', 'SQLITE_MMAP_SIZE'
+    )},
+}
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    users = [User(username=f'user{i}', password_hash='x', collection_address=f'user{i}-collection')
+             for i in range(WRITERS + 1)]
+    db.session.add_all(users)
+    db.session.flush()
+    for i in range(DEVICE_COUNT):
+        db.session.add(Device(id=f'dev{i}', user_id=users[0].id, name=f'dev{i}', hashed_device_key='key',
+                              rating_sum=5, rating_count=1))
+        for _ in range(20):
+            db.session.add(Validation(device_id=f'dev{i}', user_id=users[0].id, status='success'))
+    db.session.commit()
+    return [{'Authorization': f'Bearer {create_token(user.id)}'} for user in users]
+
+def worker(role, auth, deadline, results):
+    with app.app_context():
+        db.engine.dispose(close=False) # Don't reuse the parent's pooled connections
+    client = app.test_client()
+    done = failed = 0
+    with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+        while time.time() < deadline:
+            if role == 'read':
+                response = client.get('/api/my-validations?limit=50', headers=auth)
+            else:
+                response = client.post(f'/api/ratings/dev{done % DEVICE_COUNT}', headers=auth,
+                                       json={'rating': done % 5 + 1})
+            response.get_data() # Drain streamed bodies
+            if response.status_code < 400:
+                done += 1
+            else:
+                failed += 1
+    results.put((role, done, failed))
+
+def run_profile(profile):
+    app.config.update(PROFILES[profile])
+    with app.app_context():
+        db.engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(_db_path + suffix):
+                os.remove(_db_path + suffix)
+        auths = seed()
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    deadline = time.time() + DURATION
+    processes = [context.Process(target=worker, args=('read', auths[0], deadline, results)) for _ in range(READERS)]
+    processes += [context.Process(target=worker, args=('write', auths[i + 1], deadline, results)) for i in range(WRITERS)]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in processes:
+        role, done, failed = results.get()
+        totals[role][0] += done
+        totals[role][1] += failed
+    for process in processes:
+        process.join()
+    return totals
+
+def run():
+    print(f"{READERS} reader and {WRITERS} writer processes, {DURATION}s per run")
+    print(f"{'profile':>8} {'reads/s':>9} {'writes/s':>9} {'failed':>7}")
+    for profile in PROFILES:
+        totals = run_profile(profile)
+        print(f"{profile:>8} {totals['read'][0] / DURATION:>9.1f} {totals['write'][0] / DURATION:>9.1f} "
+              f"{totals['read'][1] + totals['write'][1]:>7}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Time POST /api/send-token for batches of 10, 1k and 10k tokens.
+
+Each run seeds a fresh database where the sender owns exactly the tokens
+being sent, then transfers all of them to a second user in one request.
+
+Run from the repository root:
+    python -m backend.benchmarks.token_transfer
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+import uuid
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from sqlalchemy import event
+from backend.app import app
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.models import User, Device, Validation, Transaction, record_token_transactions
+
+TOKEN_COUNTS = [10, 1000, 10000]
+
+def seed(token_count):
+    db.drop_all()
+    db.create_all()
+    sender = User(username='sender', password_hash='x', collection_address='sender-collection')
+    recipient = User(username='recipient', password_hash='x', collection_address='recipient-collection')
+    db.session.add_all([sender, recipient])
+    db.session.flush()
+    db.session.add(Device(id='dev0', user_id=sender.id, name='dev0', hashed_device_key='key'))
+    validation = Validation(device_id='dev0', user_id=sender.id, status='success')
+    db.session.add(validation)
+    db.session.flush()
+    mints = [Transaction(validation_id=validation.id, token_address=str(uuid.uuid4()), sender='dev0-address',
+                         receiver=sender.collection_address, status='mint') for _ in range(token_count)]
+    db.session.add_all(mints)
+    record_token_transactions(mints)
+    db.session.commit()
+    auth = {'Authorization': f'Bearer {create_token(sender.id)}'}
+    return auth, [mint.token_address for mint in mints]
+
+def run():
+    client = app.test_client()
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        print(f"{'tokens':>8} {'queries':>8} {'seconds':>8}")
+        for token_count in TOKEN_COUNTS:
+            auth, token_addresses = seed(token_count)
+            db.session.remove()
+            event.listen(db.engine, 'before_cursor_execute', count_statement)
+            statements.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+                response = client.post('/api/send-token', headers=auth, json={
+                    'recipient_address': 'recipient-collection',
+                    'token_addresses': token_addresses
+                })
+            elapsed = time.perf_counter() - start
+            event.remove(db.engine, 'before_cursor_execute', count_statement)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            print(f"{token_count:>8} {len(statements):>8} {elapsed:>8.3f}")
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Validations per second through GET /api/validate in one worker.
+
+Runs the same stream of valid codes with the per-device crypto state
+cache warm, and with it cleared before every request (every validation
+loads the device and derives its key and TOTP again). Each code is only
+accepted once, so every device is scanned once per run; the used-code
+index and rate limit counters are reset between runs, and the per-user
+limit is lifted for the single benchmark user.
+
+Run from the repository root:
+    python -m backend.benchmarks.validation_throughput
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+import pyotp
+from backend.app import app
+from backend.benchmarks.codes import encrypt_code
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.counters import MemoryCounterBackend, rate_limiter
+from backend.geoproof.models import User, Device
+from backend.geoproof.validation import device_crypto_states, replay_guard
+
+VALIDATIONS = 500
+DEVICE_COUNT = VALIDATIONS
+SECRET = 'N6OYKIG65RETZ4NI'
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    user = User(username='scanner', password_hash='x', collection_address='scanner-collection')
+    db.session.add(user)
+    db.session.flush()
+    for i in range(DEVICE_COUNT):
+        db.session.add(Device(id=f'dev{i}', user_id=user.id, name=f'dev{i}', hashed_device_key='key',
+                              secret=SECRET, device_address=f'dev{i}-address'))
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_token(user.id)}'}
+
+def run_validations(client, auth, clear_cache):
+    totp = pyotp.TOTP(SECRET)
+    urls = [
+        f'/api/validate/dev{i % DEVICE_COUNT}/{encrypt_code(SECRET, f"{totp.now()}|48.2|16.3")}'
+        for i in range(VALIDATIONS)
+    ]
+    replay_guard.backend = MemoryCounterBackend()
+    rate_limiter.backend = MemoryCounterBackend()
+    rate_limiter.user_limit = VALIDATIONS
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # Silence the debug logging
+        for url in urls:
+            if clear_cache:
+                device_crypto_states.clear()
+            assert client.get(url, headers=auth).status_code == 200
+    return VALIDATIONS / (time.perf_counter() - start)
+
+def run():
+    client = app.test_client()
+    with app.app_context():
+        auth = seed()
+        run_validations(client, auth, clear_cache=False) # Warm up
+        cold = run_validations(client, auth, clear_cache=True)
+        warm = run_validations(client, auth, clear_cache=False)
+        print(f"{VALIDATIONS} validations over {DEVICE_COUNT} devices")
+        print(f"state cache cleared: {cold:8.1f} validations/s")
+        print(f"state cache warm:    {warm:8.1f} validations/s")
+
+if __name__ == '__main__':
+    run()
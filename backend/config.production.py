@@ -5,7 +5,15 @@ SQLALCHEMY_DATABASE_URI = 'sqlite:////home/nebula/geoproof_backend/backend/insta
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SECRET_KEY = 'your-production-secret-key-here'
 SERVER_NAME = 'geoproof.org'
+#PROXY_FIX_X_FOR = 1  # Behind one reverse proxy (e.g. nginx), see README
 #FRONTEND_DIST_PATH = '/home/nebula/geoproof_backend/dist'  # Relative to app.py location
 
 basedir = os.path.abspath(os.path.dirname(__file__))
-FRONTEND_DIST_PATH = os.path.abspath(os.path.join(basedir, '../dist'))
\ No newline at end of file
+FRONTEND_DIST_PATH = os.path.abspath(os.path.join(basedir, '../dist'))
+# SQLite tuning for gunicorn workers sharing prod_auth.db (see geoproof/settings.py for the defaults)
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_BUSY_TIMEOUT = 5000  # ms
+SQLITE_CACHE_SIZE = -64000  # 64 MB per connection
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_MAINTENANCE_INTERVAL = 300  # seconds
@@ -1,56 +1,38 @@
 #!/usr/bin/env python3
-import sqlite3
-from pathlib import Path
+"""Delete all rows from the application's tables, keeping the schema.
 
-def empty_auth_db():
-    db_path = Path(__file__).parent / 'instance' / 'auth.db'
-    if not db_path.exists():
-        print(f"Error: Database file not found at {db_path}")
-        return False
+Works on whatever database the app is configured for (SQLite or
+PostgreSQL, see DATABASE_URI). Run from the repository root:
+    python -m backend.empty_auth_db
+"""
+from sqlalchemy.exc import SQLAlchemyError
+from backend.geoproof import create_app, db
 
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Get list of all tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        # Disable foreign key constraints temporarily
-        cursor.execute("PRAGMA foreign_keys=OFF;")
-        
-        # Delete all data from each table
-        for table in tables:
-            table_name = table[0]
-            if table_name not in ('sqlite_sequence', 'sqlite_stat1'):  # Skip system tables
-                try:
-                    cursor.execute(f"DELETE FROM \"{table_name}\";")
-                except sqlite3.Error as e:
-                    print(f"Warning: Could not delete from {table_name}: {e}")
-        
-        # Reset auto-increment counters (if tables exist)
-        try:
-            cursor.execute("DELETE FROM sqlite_sequence WHERE 1;")
-        except sqlite3.Error:
-            pass  # Table doesn't exist
+def empty_auth_db():
+    app = create_app(views=False)
+    with app.app_context():
+        engine = db.engine
+        existing = set(db.inspect(engine).get_table_names())
+        tables = [table for table in db.metadata.sorted_tables if table.name in existing]
         try:
-            cursor.execute("DELETE FROM sqlite_stat1 WHERE 1;")
-        except sqlite3.Error:
-            pass  # Table doesn't exist
-        
-        # Re-enable foreign keys
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        
-        conn.commit()
-        print(f"Successfully emptied all tables in {db_path}")
+            with engine.begin() as connection:
+                if engine.dialect.name == 'postgresql':
+                    # One statement, and sequences start over like sqlite_sequence below
+                    names = ', '.join(engine.dialect.identifier_preparer.quote(table.name) for table in tables)
+                    connection.exec_driver_sql(f"TRUNCATE {names} RESTART IDENTITY CASCADE")
+                else:
+                    # Children before parents, so foreign keys are never violated
+                    for table in reversed(tables):
+                        connection.execute(table.delete())
+                    if engine.dialect.name == 'sqlite' and 'sqlite_sequence' in existing:
+                        # Reset auto-increment counters
+                        connection.exec_driver_sql("DELETE FROM sqlite_sequence")
+        except SQLAlchemyError as e:
+            print(f"Database error: {e}")
+            return False
+
+        print(f"Successfully emptied all tables in {engine.url.render_as_string(hide_password=True)}")
         return True
-        
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
 
 if __name__ == "__main__":
     empty_auth_db()
@@ -1,6 +1,6 @@
 import pyotp
 import qrcode
-import sqlite3
+from sqlalchemy import create_engine, text
 import os
 import base64
 from Crypto.Cipher import AES
@@ -18,11 +18,16 @@ device_lat = 16.376279
 # device_lng = 48.200301
 # device_lat = 16.335815
 
-# Database connection helper function
-def get_db_connection():
-    conn = sqlite3.connect('../website/database.db')
-    conn.row_factory = sqlite3.Row  # Access columns by name
-    return conn
+# Same database as the backend: SQLite or PostgreSQL, see DATABASE_URI in the README
+database_uri = os.environ.get('DATABASE_URI', 'sqlite:///../instance/auth.db')
+
+def get_device_secret(device_id):
+    engine = create_engine(database_uri)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text('SELECT secret FROM device WHERE id = :id'), {'id': device_id}).scalar()
+    finally:
+        engine.dispose()
 
 def encrypt_totp(key, totp_number, lat, lng):
     """
@@ -70,14 +75,10 @@ def generate_totp_qr(device_id: str, lat: float, lng: float, secret: str = None)
     """
     if secret is None:
         # Fetch the device's secret from the database
-        conn = get_db_connection()
-        device = conn.execute('SELECT * FROM devices WHERE device_id = ?', (device_id,)).fetchone()
-        conn.close()
-
-        if not device:
-            raise ValueError(f"Device not found: {device_id}")
+        secret = get_device_secret(device_id)
 
-        secret = device['secret']
+        if not secret:
+            raise ValueError(f"Device not found or has no secret: {device_id}")
     else:
         print(f"Using provided secret for device {device_id}")
 
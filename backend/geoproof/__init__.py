@@ -0,0 +1,70 @@
+"""GeoProof backend.
+
+create_app() builds the Flask application. Tools that only need the
+database pass views=False and skip the blueprints; JWT, TOTP, AES and
+Flask-Migrate (Alembic) are imported where they are first used, so
+worker processes start without them.
+"""
+import os
+from flask import Flask
+from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+from . import models # Registers the tables on db.metadata
+from .database import init_app as init_database
+from .extensions import db, MigrateCommand
+from .passwords import password_hasher
+from .settings import load_settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def create_app(config=None, views=True):
+    # Config files, the SQLite database and the stores stay relative to backend/
+    app = Flask(__name__, root_path=BACKEND_DIR, instance_path=os.path.join(BACKEND_DIR, 'instance'))
+    load_settings(app, config)
+    if app.config['PROXY_FIX_X_FOR']:
+        # request.remote_addr (and so the login throttle) is the client's address from X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    init_cors(app)
+    db.init_app(app)
+    init_database(app)
+    password_hasher.init_app(app)
+    app.cli.add_command(MigrateCommand(app))
+    if views:
+        register_views(app)
+    return app
+
+def init_cors(app):
+    # Configure CORS based on environment
+    if os.environ.get('FLASK_ENV') == 'production':
+        CORS(app, resources={
+            r"/api/*": {
+                "origins": [
+                    "http://localhost:5173",
+                    "http://127.0.0.1:5173",
+                    "http://localhost:5050",
+                    "http://127.0.0.1:5050",
+                    "http://localhost:8080",
+                    "http://127.0.0.1:8080",
+                    "https://geoproof.org",
+                    "https://www.geoproof.org"
+                ]
+            }
+        })
+    else:
+        # Allow all origins in development
+        CORS(app)
+
+def register_views(app):
+    from . import auth, devices, frontend, ledger, profiles, validation
+    from .caching import response_cache
+    from .counters import rate_limiter
+
+    response_cache.init_app(app)
+    rate_limiter.init_app(app)
+    auth.token_denylist.init_app(app)
+    validation.replay_guard.init_app(app)
+    validation.validation_audit.init_app(app)
+    validation.validation_event_feed.init_app(app)
+    for module in (auth, devices, validation, ledger, profiles):
+        app.register_blueprint(module.bp)
+    frontend.init_app(app)
@@ -0,0 +1,220 @@
+"""Registration, login and logout, and authentication of the other endpoints."""
+import functools
+import heapq
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, g, request, jsonify, abort
+from sqlalchemy.exc import IntegrityError
+from .caching import TTLCache
+from .counters import rate_limiter
+from .extensions import db
+from .models import User, RevokedToken
+from .passwords import PasswordHasherBusy, password_hasher
+
+bp = Blueprint('auth', __name__)
+
+@bp.app_errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({'message': 'Too many login attempts in progress, try again later'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def too_many_attempts(retry_after):
+    response = jsonify({'message': 'Too many attempts, try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+@bp.route('/api/register', methods=['POST'])
+def register():
+    data = request.get_json()
+    retry_after = rate_limiter.hit_login(request.remote_addr)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    if User.query.filter_by(username=data['username']).first():
+        return jsonify({'message': 'Username already exists'}), 400
+    
+    user = User(username=data['username'])
+    user.set_password(data['password'])
+    user.collection_address = str(uuid.uuid4()) # Generate a unique collection address
+    db.session.add(user)
+    db.session.commit()
+    return jsonify({'message': 'User created successfully'}), 201
+
+def create_token(user_id):
+    import jwt # Deferred until the first login, so workers start without it
+    payload = {
+        'user_id': user_id,
+        'jti': uuid.uuid4().hex, # Names the token in the revocation denylist
+        'exp': datetime.now(timezone.utc) + timedelta(hours=24)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def verify_token(token):
+    import jwt
+    # Tokens are immutable and carry their own expiry, so a verified payload
+    # can be reused until it expires instead of re-running the HS256 check
+    payload = verified_tokens.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            abort(401, description='Token expired')
+        except jwt.InvalidTokenError:
+            abort(401, description='Invalid token')
+        verified_tokens.set(token, payload)
+    elif payload['exp'] <= time.time():
+        verified_tokens.pop(token)
+        abort(401, description='Token expired')
+    if token_denylist.is_revoked(payload.get('jti')):
+        abort(401, description='Token revoked')
+    return payload
+
+@bp.route('/api/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    # Checked before any hashing, so throttled attempts cost no CPU
+    retry_after = rate_limiter.hit_login(request.remote_addr, data['username'])
+    if retry_after:
+        return too_many_attempts(retry_after)
+    user = User.query.filter_by(username=data['username']).first()
+    
+    if not user or not user.check_password(data['password']):
+        return jsonify({'message': 'Invalid username or password'}), 401
+
+    if password_hasher.needs_rehash(user.password_hash):
+        # Upgrade to the current PASSWORD_HASH_METHOD while we have the password
+        user.set_password(data['password'])
+        db.session.commit()
+    
+    token = create_token(user.id)
+    return jsonify({
+        'message': 'Login successful',
+        'token': token,
+        'user_id': user.id
+    }), 200
+
+# --- Request authentication ---
+
+# Verified token -> claims. Entries still honour the token's own `exp`; the
+# TTL bounds how long a token keeps working after SECRET_KEY is rotated
+verified_tokens = TTLCache(max_entries=10000, ttl=60)
+
+def login_required(view):
+    """Verify the Bearer token once and expose its user id as `g.user_id`."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            abort(401, description='Missing or invalid authorization token')
+        g.user_id = verify_token(auth_header.split(' ')[1])['user_id']
+        return view(*args, **kwargs)
+    return wrapper
+
+def current_user():
+    """The authenticated User row, loaded on first use within the request."""
+    if 'user' not in g:
+        g.user = db.session.get(User, g.user_id)
+    return g.user
+
+class TokenDenylist:
+    """In-memory copy of the revoked_token table, refreshed incrementally.
+
+    Checks are a set lookup. At most every `refresh_interval` seconds a
+    request also fetches the rows revoked since the last refresh, so a
+    logout in one worker takes effect in the others within that interval.
+    Revocations can commit out of order, so each refresh re-reads the
+    `refresh_margin` seconds before the newest revocation it has seen.
+    """
+
+    def __init__(self, refresh_interval=1.0, refresh_margin=30.0, purge_probability=0.01):
+        self.refresh_interval = refresh_interval
+        self.refresh_margin = refresh_margin
+        self.purge_probability = purge_probability # Share of revocations that also delete expired ones
+        self._revoked = set()
+        self._expiries = [] # Heap of (exp, jti), to forget tokens once they expire
+        self._last_seen = None # Newest revoked_at read so far
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.refresh_interval = app.config['TOKEN_DENYLIST_REFRESH_INTERVAL']
+        self.refresh_margin = app.config['TOKEN_DENYLIST_REFRESH_MARGIN']
+        self.purge_probability = app.config['EXPIRED_ROW_PURGE_PROBABILITY']
+
+    def is_revoked(self, jti):
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+        return jti in self._revoked
+
+    def refresh(self):
+        # Requests arriving mid-refresh use the set as it is
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            query = db.session.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at)
+            if self._last_seen is None:
+                # First load: every token that hasn't expired yet
+                query = query.filter(RevokedToken.expires_at > datetime.now(timezone.utc).replace(tzinfo=None))
+            else:
+                # A revocation committed late (e.g. on PostgreSQL) carries an
+                # older revoked_at than rows already read
+                query = query.filter(
+                    RevokedToken.revoked_at >= self._last_seen - timedelta(seconds=self.refresh_margin)
+                )
+            for row in query:
+                self._add(row.jti, row.expires_at.replace(tzinfo=timezone.utc).timestamp())
+                if self._last_seen is None or row.revoked_at > self._last_seen:
+                    self._last_seen = row.revoked_at
+            now = time.time()
+            while self._expiries and self._expiries[0][0] <= now:
+                self._revoked.discard(heapq.heappop(self._expiries)[1])
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def revoke(self, jti, exp):
+        expires_at = datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.session.execute(db.insert(RevokedToken).values(jti=jti, expires_at=expires_at, revoked_at=now))
+        if random.random() < self.purge_probability: # Occasionally purge tokens that have expired
+            db.session.execute(db.delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback() # Revoked concurrently by another request
+        with self._lock:
+            self._add(jti, exp)
+
+    def _add(self, jti, exp):
+        if jti not in self._revoked:
+            self._revoked.add(jti)
+            heapq.heappush(self._expiries, (exp, jti))
+
+token_denylist = TokenDenylist()
+
+@bp.route('/api/logout', methods=['POST'])
+def logout():
+    import jwt
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        try:
+            claims = jwt.decode(auth_header.split(' ')[1], current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            claims = {} # Expired or invalid tokens are already unusable
+        if claims.get('jti') and not token_denylist.is_revoked(claims['jti']):
+            token_denylist.revoke(claims['jti'], claims['exp'])
+    return jsonify({'message': 'Logout successful'}), 200
+
+# Collection addresses never change once a user is registered
+collection_addresses = TTLCache(max_entries=10000)
+
+def collection_address(user_id):
+    address = collection_addresses.get(user_id)
+    if address is None:
+        address = db.session.query(User.collection_address).filter_by(id=user_id).scalar()
+        if address:
+            collection_addresses.set(user_id, address)
+    return address
@@ -0,0 +1,241 @@
+"""In-process caches, the shared response cache and conditional GET."""
+import functools
+import itertools
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, request, make_response
+from .database import LocalSQLiteFile
+from .models import data_version
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class MemoryCacheBackend:
+    """Response cache backend local to one process."""
+
+    def __init__(self, ttl, max_entries):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries.set(key, value)
+
+    def generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def invalidate(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+class SQLiteCacheBackend(LocalSQLiteFile):
+    """Response cache backend in a local SQLite file, shared by all worker processes."""
+
+    def __init__(self, path, ttl, purge_probability=0.01):
+        super().__init__(path)
+        self.ttl = ttl
+        self.purge_probability = purge_probability # Share of writes that also delete expired entries
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache "
+                "(key TEXT PRIMARY KEY, body BLOB NOT NULL, meta TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache_generation (tag TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT body, meta FROM response_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        mimetype, headers = json.loads(row[1])
+        return row[0], mimetype, headers
+
+    def set(self, key, value):
+        body, mimetype, headers = value
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO response_cache (key, body, meta, expires_at) VALUES (?, ?, ?, ?)",
+            (key, body, json.dumps([mimetype, headers]), time.time() + self.ttl)
+        )
+        # Entries of old generations are never read again; purge expired rows now and then
+        if random.random() < self.purge_probability:
+            connection.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def generation(self, tag):
+        row = self._connection().execute(
+            "SELECT generation FROM response_cache_generation WHERE tag = ?", (tag,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, tag):
+        self._connection().execute(
+            "INSERT INTO response_cache_generation (tag, generation) VALUES (?, 1) "
+            "ON CONFLICT (tag) DO UPDATE SET generation = generation + 1", (tag,)
+        )
+
+class NullCacheBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def generation(self, tag):
+        return 0
+
+    def invalidate(self, tag):
+        pass
+
+class ResponseCache:
+    """Cache of public GET responses, invalidated by tag from the write endpoints.
+
+    Every cached response belongs to one tag (e.g. 'devices'). Invalidating
+    a tag bumps its generation, which is part of the cache key, so all of
+    its entries are dropped at once without enumerating them; they age out
+    of the backend through the TTL. Generations of the memory backend are
+    per process, so views answered with a conditional ETag are cached with
+    versioned=True: the tag's shared DataVersion is then part of the key as
+    well, and a body is never sent with a newer version's ETag.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        ttl = app.config['RESPONSE_CACHE_TTL']
+        if backend == 'memory':
+            self.backend = MemoryCacheBackend(ttl, app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif backend == 'sqlite':
+            self.backend = SQLiteCacheBackend(app.config['RESPONSE_CACHE_PATH'], ttl,
+                                              app.config['EXPIRED_ROW_PURGE_PROBABILITY'])
+        elif backend == 'null':
+            self.backend = NullCacheBackend()
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend}")
+        self.max_bytes = app.config['RESPONSE_CACHE_MAX_BYTES']
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.invalidate(tag)
+
+    def _buffer(self, response):
+        # Read a (possibly streamed) body up to max_bytes. Bigger bodies are
+        # handed back to the client unchanged and not cached.
+        chunks = []
+        size = 0
+        iterator = iter(response.response)
+        for chunk in iterator:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.max_bytes:
+                response.response = itertools.chain(chunks, iterator)
+                return None
+        return b''.join(chunks)
+
+    def cached(self, tag, versioned=False):
+        """Cache 200 responses of a view under the tag computed from its arguments.
+
+        With `versioned`, the tag is also a DataVersion name (as given to
+        conditional) whose version is part of the cache key.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                name = tag(**kwargs)
+                key = f"{name}|{self.backend.generation(name)}|{request.full_path}"
+                if versioned:
+                    key = f"{key}|v{data_version(name)}"
+                hit = self.backend.get(key)
+                if hit is not None:
+                    body, mimetype, headers = hit
+                    return Response(body, mimetype=mimetype, headers=headers)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = self._buffer(response)
+                if body is None:
+                    return response
+                headers = {k: v for k, v in response.headers.items() if k.startswith('X-')}
+                self.backend.set(key, (body, response.mimetype, headers))
+                return Response(body, mimetype=response.mimetype, headers=headers)
+            return wrapper
+        return decorator
+
+response_cache = ResponseCache()
+
+# --- Conditional GET ---
+
+def conditional(version_name):
+    """Answer GET requests with 304 while the named data version is unchanged.
+
+    `version_name` maps the view arguments to a DataVersion name. The
+    version is read before the view runs, so a concurrent write can only
+    make the ETag older than the body, never newer.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = f"v{data_version(version_name(**kwargs))}"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.cache_control.no_cache = True # Always revalidate
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,158 @@
+"""Window counters: TOTP replay protection and rate limits."""
+import heapq
+import math
+import random
+import threading
+import time
+from .database import LocalSQLiteFile
+
+class MemoryCounterBackend:
+    """Expiring counters local to one process."""
+
+    def __init__(self):
+        self._counters = {} # key -> (count, expires_at)
+        self._heap = [] # (expires_at, key), to evict in expiry order
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expired_at, expired_key = heapq.heappop(self._heap)
+            counter = self._counters.get(expired_key)
+            if counter and counter[1] == expired_at:
+                del self._counters[expired_key]
+
+    def acquire(self, key, limit, expires_at, amount=1):
+        """Count `amount` uses of `key` unless that takes it past `limit`. Returns whether they were counted."""
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            counter = self._counters.get(key)
+            if counter is None:
+                self._counters[key] = (amount, expires_at)
+                heapq.heappush(self._heap, (expires_at, key))
+                return True
+            if counter[0] + amount > limit:
+                return False
+            self._counters[key] = (counter[0] + amount, counter[1])
+            return True
+
+    def count(self, key):
+        counter = self._counters.get(key)
+        if counter is None or counter[1] <= time.time():
+            return 0
+        return counter[0]
+
+class SQLiteCounterBackend(LocalSQLiteFile):
+    """Expiring counters in a local SQLite file, shared by all worker processes."""
+
+    def __init__(self, path, table, purge_probability=0.01):
+        super().__init__(path)
+        self.table = table
+        self.purge_probability = purge_probability # Share of acquires that also delete expired counters
+        self._connection().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def acquire(self, key, limit, expires_at, amount=1):
+        if amount > limit:
+            return False
+        now = time.time()
+        connection = self._connection()
+        if random.random() < self.purge_probability:
+            connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        # A single statement, so concurrent workers can't overshoot the limit
+        cursor = connection.execute(
+            f"INSERT INTO {self.table} (key, count, expires_at) VALUES (?1, ?5, ?2) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "count = CASE WHEN expires_at <= ?3 THEN ?5 ELSE count + ?5 END, "
+            "expires_at = CASE WHEN expires_at <= ?3 THEN excluded.expires_at ELSE expires_at END "
+            "WHERE expires_at <= ?3 OR count + ?5 <= ?4",
+            (key, expires_at, now, limit, amount)
+        )
+        return cursor.rowcount == 1
+
+    def count(self, key):
+        row = self._connection().execute(
+            f"SELECT count FROM {self.table} WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+def counter_backend(app, backend, path, table):
+    if backend == 'memory':
+        return MemoryCounterBackend()
+    if backend == 'sqlite':
+        return SQLiteCounterBackend(path, table, app.config['EXPIRED_ROW_PURGE_PROBABILITY'])
+    raise ValueError(f"Unknown counter backend: {backend}")
+
+class RateLimiter:
+    """Fixed-window rate limits, checked before any decryption, hashing or DB work.
+
+    Devices accept at most max_validations successful validations per QR,
+    i.e. per qr_refresh_time window (aligned to the epoch, like the QR
+    refreshes). Users may make at most VALIDATION_USER_RATE_LIMIT attempts
+    per minute, successful or not. Logins are limited per client address
+    and per username over LOGIN_RATE_WINDOW seconds.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = counter_backend(app, app.config['RATE_LIMIT_BACKEND'],
+                                       app.config['RATE_LIMIT_PATH'], 'rate_limit')
+        self.user_limit = app.config['VALIDATION_USER_RATE_LIMIT']
+        self.login_window = app.config['LOGIN_RATE_WINDOW']
+        self.login_username_limit = app.config['LOGIN_USERNAME_RATE_LIMIT']
+        self.login_address_limit = app.config['LOGIN_ADDRESS_RATE_LIMIT']
+
+    @staticmethod
+    def _window(key, length, at):
+        # Returns (counter key, window end)
+        index = int(at // length)
+        return f'{key}:{index}', (index + 1) * length
+
+    def _retry_after(self, window_end):
+        return max(1, math.ceil(window_end - time.time()))
+
+    def hit_user(self, user_id, attempts=1):
+        """Count attempts by the user. Returns seconds to wait if over the limit, else None."""
+        key, window_end = self._window(f'user:{user_id}', 60, time.time())
+        if self.backend.acquire(key, self.user_limit, window_end, attempts):
+            return None
+        return self._retry_after(window_end)
+
+    def hit_login(self, address, username=None):
+        """Count a login (or registration) attempt. Returns seconds to wait if over a limit, else None."""
+        limits = [(f'login-address:{address}', self.login_address_limit)]
+        if username is not None:
+            limits.append((f'login-user:{username}', self.login_username_limit))
+        for key, limit in limits:
+            key, window_end = self._window(key, self.login_window, time.time())
+            if not self.backend.acquire(key, limit, window_end):
+                return self._retry_after(window_end)
+        return None
+
+    def device_exhausted(self, device_id, device, at=None):
+        """Seconds to wait if the device's current QR has no validations left, else None."""
+        key, window_end = self._window(f'device:{device_id}', device.qr_refresh_time, at or time.time())
+        if self.backend.count(key) < device.max_validations:
+            return None
+        return self._retry_after(window_end)
+
+    def hit_device(self, device_id, device, at=None, retention=0):
+        """Count a successful validation of the device's QR at `at`, as device_exhausted.
+
+        The count is kept `retention` seconds past the end of the window, for
+        as long as validations of that QR may still be submitted: a counter
+        that had already expired would start over with every late submission.
+        """
+        key, window_end = self._window(f'device:{device_id}', device.qr_refresh_time, at or time.time())
+        if self.backend.acquire(key, device.max_validations, window_end + retention):
+            return None
+        return self._retry_after(window_end)
+
+rate_limiter = RateLimiter()
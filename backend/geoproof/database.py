@@ -0,0 +1,107 @@
+"""Connection settings and background maintenance for SQLite databases."""
+import os
+import sqlite3
+import threading
+import time
+from .extensions import db
+
+# The counter, cache, data version and token ownership upserts use INSERT ... ON CONFLICT
+SQLITE_MIN_VERSION = (3, 24, 0)
+
+def sqlite_pragmas(config):
+    pragmas = [
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('foreign_keys', None if config['SQLITE_FOREIGN_KEYS'] is None else int(config['SQLITE_FOREIGN_KEYS'])),
+    ]
+    return [(name, value) for name, value in pragmas if value is not None]
+
+def configure_sqlite_connection(config, dbapi_connection):
+    # Runs for every new pooled connection, before SQLAlchemy begins a transaction
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas(config):
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+class LocalSQLiteFile:
+    """Base for backends keeping their own rows in a local SQLite file, shared by all worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, keep one per thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+class SQLiteMaintenance:
+    """Periodic WAL checkpoint and PRAGMA optimize for SQLite databases.
+
+    WAL mode appends every commit to the -wal file, and SQLite only
+    checkpoints it back into the database when no reader holds an old
+    snapshot, so under steady traffic the log can keep growing. A
+    background thread runs a PASSIVE checkpoint (never blocks readers or
+    the writer) and lets SQLite refresh its query planner statistics every
+    SQLITE_MAINTENANCE_INTERVAL seconds. Started by the first request.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['SQLITE_MAINTENANCE_INTERVAL']
+
+    def ensure_started(self):
+        if not self.interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sqlite-maintenance', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                return
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"SQLite maintenance failed: {str(e)}")  # Debug logging
+
+    def run_once(self):
+        """Checkpoint the WAL and optimize; returns the wal_checkpoint result row."""
+        with self.app.app_context(), db.engine.connect() as connection:
+            result = connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            connection.exec_driver_sql("PRAGMA optimize")
+            return result
+
+sqlite_maintenance = SQLiteMaintenance()
+
+def init_app(app):
+    # The local counter and cache backends use the sqlite3 module even with another database
+    if sqlite3.sqlite_version_info < SQLITE_MIN_VERSION:
+        raise RuntimeError(f"SQLite {'.'.join(map(str, SQLITE_MIN_VERSION))} or newer is required, "
+                           f"found {sqlite3.sqlite_version}")
+    with app.app_context():
+        db.event.listen(db.engine, 'connect',
+                        lambda dbapi_connection, connection_record: configure_sqlite_connection(app.config, dbapi_connection))
+    sqlite_maintenance.init_app(app)
+    app.before_request(sqlite_maintenance.ensure_started)
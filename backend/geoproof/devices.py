@@ -0,0 +1,591 @@
+"""Devices, their images, map clusters and ratings."""
+import base64
+import hashlib
+import math
+import os
+import re
+import uuid
+import click
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, g, request, jsonify, abort, send_from_directory
+from .auth import login_required, current_user
+from .caching import TTLCache, response_cache, conditional
+from .extensions import db
+from .models import (User, Validation, Rating, Device, requested_fields, bump_data_version,
+                     GEOHASH_PRECISION, geohash_cell_size, geohash_prefixes_for_bbox)
+from .validation import device_crypto_states
+
+bp = Blueprint('devices', __name__, cli_group=None)
+
+# --- Image store ---
+
+# Images are stored once per content hash and served as immutable files
+IMAGE_TYPES = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp'
+}
+IMAGE_DATA_URL = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+IMAGE_NAME = re.compile(r'^([0-9a-f]{64})\.(%s)$' % '|'.join(IMAGE_TYPES.values()))
+IMAGE_URL_PREFIX = '/api/images/'
+
+def image_path(name):
+    # Shard by the first two hex digits to keep directories small
+    return os.path.join(current_app.config['IMAGE_STORE_PATH'], name[:2], name)
+
+def store_image(value):
+    """Move a base64 data URL into the blob store and return its URL.
+
+    Anything that isn't a data URL (None, or an already stored image URL)
+    is returned unchanged.
+    """
+    if not value or not value.startswith('data:'):
+        return value
+
+    match = IMAGE_DATA_URL.match(value)
+    if not match or match.group(1) not in IMAGE_TYPES:
+        abort(400, description=f"Unsupported image, expected one of: {', '.join(IMAGE_TYPES)}")
+    try:
+        content = base64.b64decode(match.group(2), validate=True)
+    except ValueError:
+        abort(400, description="Invalid image data")
+
+    name = f"{hashlib.sha256(content).hexdigest()}.{IMAGE_TYPES[match.group(1)]}"
+    path = image_path(name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see partial images
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return IMAGE_URL_PREFIX + name
+
+@bp.route('/api/images/<string:name>', methods=['GET'])
+def get_image(name):
+    match = IMAGE_NAME.match(name)
+    if not match:
+        abort(404, description="Image not found")
+
+    # The name is the content hash, so it is also a strong ETag and never changes
+    response = send_from_directory(
+        os.path.dirname(image_path(name)), name,
+        etag=match.group(1), max_age=31536000, conditional=True
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# --- Device API Endpoints ---
+
+RECENT_VALIDATIONS_PER_DEVICE = 3
+
+def recent_validations_by_device(device_ids):
+    # Last N successful validation timestamps for every device in one windowed query
+    ranked = db.session.query(
+        Validation.device_id.label('device_id'),
+        Validation.timestamp.label('timestamp'),
+        db.func.row_number().over(
+            partition_by=Validation.device_id,
+            order_by=(Validation.timestamp.desc(), Validation.id.desc())
+        ).label('rank')
+    ).filter(
+        Validation.status == 'success',
+        Validation.device_id.in_(device_ids)
+    ).subquery()
+
+    rows = db.session.query(ranked.c.device_id, ranked.c.timestamp)\
+        .filter(ranked.c.rank <= RECENT_VALIDATIONS_PER_DEVICE)\
+        .order_by(ranked.c.device_id, ranked.c.rank)\
+        .all()
+
+    recent = {}
+    for device_id, timestamp in rows:
+        recent.setdefault(device_id, []).append(timestamp.isoformat())
+    return recent
+
+# Fields /api/devices adds on top of Device.serialized_fields, with the
+# Device attributes they read
+DEVICE_PAYLOAD_FIELDS = {
+    'owner': (),
+    'recentValidations': (),
+    'averageRating': ('rating_sum', 'rating_count'),
+    'secret': ('secret',),
+    'ratingCount': ('rating_count',)
+}
+
+def build_device_payloads(device_query, fields=None):
+    # Serialize a (filtered) Device query with owner and recent validations
+    # using a fixed number of queries, independent of row count. Rating
+    # summaries come from the denormalized Device.rating_sum/rating_count.
+    # With `fields` only those keys are built and only their columns loaded.
+    def wanted(name):
+        return fields is None or name in fields
+
+    device_ids = device_query.with_entities(Device.id).statement
+    extra_attributes = [a for name in (fields or ()) for a in DEVICE_PAYLOAD_FIELDS.get(name, ())]
+    devices = Device.load_fields(device_query.join(User).add_columns(User.username), fields, *extra_attributes).all()
+    recent = recent_validations_by_device(device_ids) if wanted('recentValidations') else {}
+
+    devices_data = []
+    for device, owner_username in devices:
+        device_dict = device.to_dict(fields)
+        if wanted('owner'):
+            device_dict['owner'] = owner_username
+        if wanted('recentValidations'):
+            device_dict['recentValidations'] = recent.get(device.id, [])
+        if wanted('averageRating'):
+            device_dict['averageRating'] = device.average_rating
+        if wanted('secret'):
+            device_dict['secret'] = device.secret
+        if wanted('ratingCount'):
+            device_dict['ratingCount'] = device.rating_count
+        devices_data.append(device_dict)
+    return devices_data
+
+EARTH_RADIUS_METERS = 6371000
+
+def filter_devices_in_bbox(query, south, west, north, east):
+    # Boxes crossing the antimeridian (west > east) are split in two
+    boxes = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    prefixes = []
+    for box_west, box_east in boxes:
+        prefixes.extend(geohash_prefixes_for_bbox(south, box_west, north, box_east))
+
+    # Every geohash character sorts below '{', so each prefix is an index range scan
+    cells = db.or_(*[(Device.geohash >= prefix) & (Device.geohash < prefix + '{') for prefix in prefixes])
+    longitudes = db.or_(*[Device.longitude.between(box_west, box_east) for box_west, box_east in boxes])
+    return query.filter(cells, Device.latitude.between(south, north), longitudes)
+
+def bbox_around(latitude, longitude, radius):
+    """(south, west, north, east) enclosing every point within `radius` meters; west > east across the antimeridian."""
+    angle = radius / EARTH_RADIUS_METERS
+    lat_delta = math.degrees(angle)
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    if south == -90.0 or north == 90.0 or angle >= math.pi / 2:
+        return south, -180.0, north, 180.0 # Encloses a pole
+    # The circle is widest where it touches its meridians, poleward of its
+    # centre, so the half-width is asin(sin(r/R) / cos(lat)) rather than r/(R cos(lat))
+    ratio = math.sin(angle) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return south, -180.0, north, 180.0
+    lng_delta = math.degrees(math.asin(ratio))
+    west = (longitude - lng_delta + 180) % 360 - 180
+    east = (longitude + lng_delta + 180) % 360 - 180
+    return south, west, north, east
+
+def haversine_meters(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+def check_validation_settings(data):
+    # 0 validations per QR disables a device, but its QR must refresh at some point
+    qr_refresh_time = data.get('qrRefreshTime', 60)
+    if isinstance(qr_refresh_time, bool) or not isinstance(qr_refresh_time, int) or qr_refresh_time < 1:
+        abort(400, description="qrRefreshTime must be a positive number of seconds")
+    max_validations = data.get('maxValidations', 5)
+    if isinstance(max_validations, bool) or not isinstance(max_validations, int) or max_validations < 0:
+        abort(400, description="maxValidations must be a number, 0 or more")
+
+def parse_coordinates(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        abort(400, description=f"{name} must be {count} comma-separated numbers")
+    return numbers
+
+@bp.route('/api/devices', methods=['GET'])
+@conditional(lambda: 'devices')
+@response_cache.cached(lambda: 'devices', versioned=True)
+def get_devices():
+    query = Device.query
+    fields = requested_fields(Device, *DEVICE_PAYLOAD_FIELDS)
+
+    # ?bbox=west,south,east,north (Leaflet's LatLngBounds.toBBoxString())
+    if request.args.get('bbox'):
+        west, south, east, north = parse_coordinates(request.args['bbox'], 4, 'bbox')
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            abort(400, description="bbox is out of range")
+        query = filter_devices_in_bbox(query, south, west, north, east)
+        return jsonify(build_device_payloads(query, fields)), 200
+
+    # ?near=lat,lng&radius=<meters>
+    if request.args.get('near'):
+        latitude, longitude = parse_coordinates(request.args['near'], 2, 'near')
+        radius = request.args.get('radius', type=float)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            abort(400, description="near is out of range")
+        if radius is None or radius <= 0:
+            abort(400, description="radius must be a positive number of meters")
+
+        # Pre-filter on the enclosing box, then apply the exact distance
+        query = filter_devices_in_bbox(query, *bbox_around(latitude, longitude, radius))
+
+        # The distance check needs the location even if the client didn't ask for it
+        payload_fields = fields | {'location'} if fields is not None else None
+        devices_data = [
+            device for device in build_device_payloads(query, payload_fields)
+            if haversine_meters(latitude, longitude, *device['location']) <= radius
+        ]
+        if fields is not None and 'location' not in fields:
+            for device in devices_data:
+                del device['location']
+        return jsonify(devices_data), 200
+
+    return jsonify(build_device_payloads(query, fields)), 200
+
+@bp.route('/api/my-devices', methods=['GET'])
+@login_required
+def get_my_devices():
+    user_id = g.user_id
+    
+    fields = requested_fields(Device)
+    devices = Device.load_fields(Device.query.filter_by(user_id=user_id), fields).all()
+    return jsonify([device.to_dict(fields) for device in devices]), 200
+
+# Get a single device
+@bp.route('/api/devices/<string:device_id>', methods=['GET'])
+@conditional(lambda device_id: f'device:{device_id}')
+def get_device(device_id):
+    fields = requested_fields(Device)
+    device = Device.load_fields(Device.query.filter_by(id=device_id), fields).first()
+    if device is None:
+        abort(404, description="Device not found")
+    return jsonify(device.to_dict(fields)), 200
+
+@bp.route('/api/devices', methods=['POST'])
+@login_required
+def add_device():
+    user_id = g.user_id
+
+    data = request.get_json()
+    if not data:
+        abort(400, description="Invalid JSON data")
+
+    # Basic validation
+    required_fields = ['id', 'name', 'location', 'hashed_device_key']
+    if not all(field in data for field in required_fields):
+        abort(400, description=f"Missing required fields: {required_fields}")
+    check_validation_settings(data)
+
+    if Device.query.get(data['id']):
+         abort(400, description=f"Device with ID {data['id']} already exists")
+
+    user = current_user()
+    if not user:
+        abort(404, description="User not found")
+
+
+    new_device = Device(
+        id=data['id'],
+        user_id=user_id,
+        name=data['name'],
+        hashed_device_key=data['hashed_device_key'], # Use the pre-hashed key from frontend
+        secret=data.get('secret'), # Store the raw key in secret column
+        description=data.get('description'),
+        status=data.get('status', 'active'),
+        qr_refresh_time=data.get('qrRefreshTime', 60),
+        max_validations=data.get('maxValidations', 5),
+        latitude=data['location'][0] if data.get('location') and len(data['location']) == 2 else None,
+        longitude=data['location'][1] if data.get('location') and len(data['location']) == 2 else None,
+        address=data.get('address'),
+        image=store_image(data.get('image')),
+        device_address=str(uuid.uuid4()), # Generate a unique device address
+        # last_validation is initially null
+        rating_sum=5, # Accounts for the owner's initial rating below
+        rating_count=1
+    )
+    db.session.add(new_device)
+    
+    # Create initial 5-star rating from owner
+    initial_rating = Rating(
+        device_id=new_device.id,
+        user_id=user_id,
+        rating=5
+    )
+    db.session.add(initial_rating)
+    
+    db.session.commit()
+    invalidate_device_clusters(new_device.latitude, new_device.longitude)
+    response_cache.invalidate('devices', f'ratings:{new_device.id}')
+    return jsonify(new_device.to_dict()), 201
+
+@bp.route('/api/devices/<string:device_id>', methods=['PUT'])
+@login_required
+def update_device(device_id):
+    user_id = g.user_id
+
+    device = Device.query.get(device_id)
+    if device is None:
+        abort(404, description="Device not found")
+    
+    if device.user_id != user_id:
+        abort(403, description="Not authorized to update this device")
+
+    data = request.get_json()
+    if not data:
+        abort(400, description="Invalid JSON data")
+
+    check_validation_settings(data)
+    old_location = (device.latitude, device.longitude)
+    device.name = data.get('name', device.name)
+    device.description = data.get('description', device.description)
+    device.status = data.get('status', device.status)
+    device.qr_refresh_time = data.get('qrRefreshTime', device.qr_refresh_time)
+    device.max_validations = data.get('maxValidations', device.max_validations)
+    if 'location' in data and data['location'] and len(data['location']) == 2:
+        device.latitude = data['location'][0]
+        device.longitude = data['location'][1]
+    device.address = data.get('address', device.address)
+    device.image = store_image(data.get('image', device.image))
+    if 'secret' in data:
+        device.secret = data['secret']
+    # last_validation is usually updated by a different process/endpoint
+
+    db.session.commit()
+    device_crypto_states.pop(device_id)
+    response_cache.invalidate('devices')
+    if (device.latitude, device.longitude) != old_location:
+        invalidate_device_clusters(*old_location)
+        invalidate_device_clusters(device.latitude, device.longitude)
+    return jsonify(device.to_dict()), 200
+
+# --- Map clusters ---
+
+CLUSTER_MAX_ZOOM = 18
+CLUSTER_GRID = 4 # Geohash cells are at most 1/CLUSTER_GRID of a tile wide
+MERCATOR_MAX_LATITUDE = 85.0511287798
+
+# Clusters per tile; location writes invalidate the affected tiles directly,
+# the TTL bounds staleness in other worker processes.
+cluster_cache = TTLCache(max_entries=4096, ttl=300)
+
+def tile_bounds(zoom, x, y):
+    # (south, west, north, east) of a Web Mercator (slippy map) tile
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+def tile_for_location(zoom, latitude, longitude):
+    n = 2 ** zoom
+    latitude = max(min(latitude, MERCATOR_MAX_LATITUDE), -MERCATOR_MAX_LATITUDE)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def cluster_precision(zoom):
+    tile_width = 360.0 / 2 ** zoom
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell_size(precision)[1] <= tile_width / CLUSTER_GRID:
+            return precision
+    return GEOHASH_PRECISION
+
+def compute_tile_clusters(zoom, x, y):
+    # Group the tile's devices by geohash cell in SQL
+    south, west, north, east = tile_bounds(zoom, x, y)
+    last_tile = 2 ** zoom - 1
+    # Edge tiles also take the polar regions Web Mercator can't show
+    north = 90.0 if y == 0 else north
+    south = -90.0 if y == last_tile else south
+    cell = db.func.substr(Device.geohash, 1, cluster_precision(zoom))
+    query = db.session.query(
+        db.func.count(Device.id),
+        db.func.avg(Device.latitude),
+        db.func.avg(Device.longitude),
+        db.func.sum(Device.rating_sum),
+        db.func.sum(Device.rating_count),
+        db.func.min(Device.id)
+    )
+    # Tiles are half-open on their north/east edge; the geohash cover is
+    # inclusive, so the exact bounds below keep each device in one tile
+    rows = filter_devices_in_bbox(query, south, west, north, east)\
+        .filter(Device.latitude < north if y > 0 else db.true(),
+                Device.longitude < east if x < last_tile else db.true())\
+        .group_by(cell)\
+        .all()
+
+    clusters = []
+    for count, latitude, longitude, rating_sum, rating_count, first_device_id in rows:
+        cluster = {
+            'count': count,
+            'location': [latitude, longitude],
+            'averageRating': rating_sum / rating_count if rating_count else None
+        }
+        if count == 1:
+            cluster['deviceId'] = first_device_id
+        clusters.append(cluster)
+    return clusters
+
+def invalidate_device_clusters(latitude, longitude):
+    # Drop the one tile per zoom level that contains this location
+    if latitude is None or longitude is None:
+        return
+    for zoom in range(CLUSTER_MAX_ZOOM + 1):
+        cluster_cache.pop((zoom, *tile_for_location(zoom, latitude, longitude)))
+
+@bp.route('/api/device-clusters/<int:zoom>/<int:x>/<int:y>', methods=['GET'])
+def get_device_clusters(zoom, x, y):
+    if zoom > CLUSTER_MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+        abort(400, description="Invalid tile coordinates")
+
+    key = (zoom, x, y)
+    clusters = cluster_cache.get(key)
+    if clusters is None:
+        clusters = compute_tile_clusters(zoom, x, y)
+        cluster_cache.set(key, clusters)
+
+    return jsonify({'zoom': zoom, 'x': x, 'y': y, 'clusters': clusters}), 200
+
+# --- Ratings ---
+
+@bp.route('/api/ratings/<string:device_id>', methods=['POST'])
+@login_required
+def submit_rating(device_id):
+    user_id = g.user_id
+
+    data = request.get_json()
+    if not data or 'rating' not in data:
+        abort(400, description="Missing rating value")
+
+    rating_value = data['rating']
+    if not isinstance(rating_value, int) or rating_value < 1 or rating_value > 5:
+        abort(400, description="Rating must be an integer between 1 and 5")
+
+    device = Device.query.get(device_id)
+    if not device:
+        abort(404, description="Device not found")
+
+    # Check if user already rated this device
+    existing_rating = Rating.query.filter_by(
+        device_id=device_id,
+        user_id=user_id
+    ).first()
+
+    if existing_rating:
+        # Update existing rating
+        rating_delta = rating_value - existing_rating.rating
+        existing_rating.rating = rating_value
+        existing_rating.timestamp = datetime.now(timezone.utc)
+        count_delta = 0
+    else:
+        # Create new rating
+        new_rating = Rating(
+            device_id=device_id,
+            user_id=user_id,
+            rating=rating_value
+        )
+        db.session.add(new_rating)
+        rating_delta = rating_value
+        count_delta = 1
+
+    # Keep the device aggregates in step within the same transaction. The
+    # increments are issued as SQL expressions so concurrent writers don't
+    # overwrite each other.
+    device.rating_sum = Device.rating_sum + rating_delta
+    device.rating_count = Device.rating_count + count_delta
+
+    db.session.commit()
+    invalidate_device_clusters(device.latitude, device.longitude) # Average rating changed
+    response_cache.invalidate('devices', f'ratings:{device_id}')
+    return jsonify({'message': 'Rating submitted successfully'}), 200
+
+@bp.route('/api/ratings/<string:device_id>', methods=['GET'])
+@conditional(lambda device_id: f'ratings:{device_id}')
+@response_cache.cached(lambda device_id: f'ratings:{device_id}', versioned=True)
+def get_device_ratings(device_id):
+    if not db.session.query(Device.query.filter_by(id=device_id).exists()).scalar():
+        abort(404, description="Device not found")
+
+    fields = requested_fields(Rating)
+    ratings = Rating.load_fields(Rating.query.filter_by(device_id=device_id), fields).all()
+    return jsonify([r.to_dict(fields) for r in ratings]), 200
+
+@bp.route('/api/my-rating/<string:device_id>', methods=['GET'])
+@login_required
+def get_my_rating(device_id):
+    user_id = g.user_id
+
+    rating = Rating.query.filter_by(
+        device_id=device_id,
+        user_id=user_id
+    ).first()
+
+    if not rating:
+        return jsonify({'rating': None}), 200
+
+    return jsonify(rating.to_dict()), 200
+
+@bp.route('/api/devices/<string:device_id>', methods=['DELETE'])
+@login_required
+def delete_device(device_id):
+    user_id = g.user_id
+
+    device = Device.query.get(device_id)
+    if device is None:
+        abort(404, description="Device not found")
+    
+    if device.user_id != user_id:
+        abort(403, description="Not authorized to delete this device")
+
+    location = (device.latitude, device.longitude)
+    usernames = [username for username, in db.session.query(User.username).join(
+        Validation, Validation.user_id == User.id
+    ).filter(Validation.device_id == device_id).distinct()]
+    # The schema's ON DELETE rules, applied here too for SQLite without
+    # foreign_keys: ratings go with the device, validations stay as the
+    # history of their tokens
+    Validation.query.filter_by(device_id=device_id).update({'device_id': None}, synchronize_session=False)
+    bump_data_version(*(f'user-validations:{username}' for username in usernames))
+    Rating.query.filter_by(device_id=device_id).delete(synchronize_session=False)
+    db.session.delete(device)
+    db.session.commit()
+    device_crypto_states.pop(device_id)
+    invalidate_device_clusters(*location)
+    response_cache.invalidate('devices', f'ratings:{device_id}',
+                              *(f'user-validations:{username}' for username in usernames))
+    return jsonify({'message': 'Device deleted successfully'}), 200
+
+# --- CLI commands ---
+
+def rating_aggregate_drift():
+    # Devices whose denormalized rating columns disagree with the Rating table
+    actual = db.session.query(
+        Rating.device_id.label('device_id'),
+        db.func.sum(Rating.rating).label('rating_sum'),
+        db.func.count(Rating.id).label('rating_count')
+    ).group_by(Rating.device_id).subquery()
+
+    actual_sum = db.func.coalesce(actual.c.rating_sum, 0)
+    actual_count = db.func.coalesce(actual.c.rating_count, 0)
+    return db.session.query(Device, actual_sum, actual_count)\
+        .outerjoin(actual, Device.id == actual.c.device_id)\
+        .filter((Device.rating_sum != actual_sum) | (Device.rating_count != actual_count))\
+        .all()
+
+@bp.cli.command('check-ratings')
+@click.option('--fix', is_flag=True, help='Rewrite drifted aggregates from the Rating table.')
+def check_ratings(fix):
+    """Detect drift between Device rating aggregates and the Rating table."""
+    drift = rating_aggregate_drift()
+    for device, rating_sum, rating_count in drift:
+        click.echo(f"{device.id}: stored sum={device.rating_sum} count={device.rating_count}, "
+                   f"actual sum={rating_sum} count={rating_count}")
+        if fix:
+            device.rating_sum = rating_sum
+            device.rating_count = rating_count
+
+    if not drift:
+        click.echo('Rating aggregates are consistent')
+        return
+    if fix:
+        db.session.commit()
+        click.echo(f'Fixed {len(drift)} device(s)')
+    else:
+        raise SystemExit(1)
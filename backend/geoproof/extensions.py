@@ -0,0 +1,26 @@
+"""Extension instances, bound to an application by create_app()."""
+import click
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+def init_migrate(app):
+    # Flask-Migrate imports Alembic, which only migration tooling needs
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+class MigrateCommand(click.Group):
+    """`flask db`, binding Flask-Migrate to the app only when it is run.
+
+    Stands in for Flask-Migrate's command group, which replaces it once
+    bound; parsing the arguments is handed to that group.
+    """
+
+    def __init__(self, app):
+        super().__init__('db', help='Perform database migrations.')
+        self.app = app
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        init_migrate(self.app)
+        return self.app.cli.commands['db'].make_context(info_name, args, parent, **extra)
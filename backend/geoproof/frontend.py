@@ -0,0 +1,39 @@
+"""Serving the built frontend (production) or redirecting to the dev server."""
+import os
+from flask import request, jsonify, abort, send_from_directory, redirect
+
+def init_app(app):
+    @app.route('/')
+    def serve_frontend():
+        if os.environ.get('FLASK_ENV') == 'production':
+            try:
+                return send_from_directory(app.config['FRONTEND_DIST_PATH'], 'index.html')
+            except Exception as e:
+                app.logger.error(f"Failed to serve frontend from {app.config['FRONTEND_DIST_PATH']}: {str(e)}")
+                abort(500, description="Frontend files not found")
+        else:
+            # Redirect to Vite dev server in development
+            return redirect('http://localhost:8080')
+
+    @app.errorhandler(404)
+    def not_found(e):
+        if request.path.startswith('/api/'):
+            return jsonify({'error': 'Not found'}), 404
+        # For SPA routing, fall back to index.html
+        if os.environ.get('FLASK_ENV') == 'production':
+            return send_from_directory('../dist', 'index.html')
+        return send_from_directory(app.static_folder, 'index.html')
+
+    # Configure static file serving in production
+    if os.environ.get('FLASK_ENV') == 'production':
+        @app.route('/<path:path>')
+        def serve_static(path):
+            try:
+                return send_from_directory(app.config['FRONTEND_DIST_PATH'], path)
+            except Exception as e:
+                app.logger.error(f"Failed to serve static file {path} from {app.config['FRONTEND_DIST_PATH']}: {str(e)}")
+                try:
+                    return send_from_directory(app.config['FRONTEND_DIST_PATH'], 'index.html')
+                except Exception as e:
+                    app.logger.error(f"Failed to serve fallback index.html: {str(e)}")
+                    abort(500, description="Frontend files not found")
@@ -0,0 +1,150 @@
+"""Token ownership: the user's tokens, transfers and rebuilding the projection."""
+import click
+from datetime import datetime, timezone
+from flask import Blueprint, g, request, jsonify, abort
+from .auth import login_required, collection_address
+from .extensions import db
+from .models import User, Transaction, TokenOwnership, requested_fields
+
+bp = Blueprint('ledger', __name__, cli_group=None)
+
+# Bulk transfers move the tokens first, then point them at their new transactions
+TRANSFER_TOKEN_OWNERSHIP = db.text(
+    "UPDATE token_ownership SET owner = :receiver, status = 'transferred' "
+    "WHERE token_address IN :token_addresses AND owner = :sender AND status IN ('mint', 'transferred')"
+).bindparams(db.bindparam('token_addresses', expanding=True))
+# A correlated subquery rather than UPDATE ... FROM, which needs SQLite 3.33
+LINK_TOKEN_OWNERSHIP = db.text(
+    "UPDATE token_ownership SET last_transaction_id = ("
+    "SELECT max(id) FROM transactions t WHERE t.token_address = token_ownership.token_address "
+    "AND t.id > :after_id AND t.sender = :sender AND t.status = 'transferred'"
+    ") WHERE token_address IN :token_addresses"
+).bindparams(db.bindparam('token_addresses', expanding=True))
+TOKEN_TRANSFER_CHUNK = 500 # Token addresses per IN (...) ownership query
+
+@bp.route('/api/my-transactions', methods=['GET'])
+@login_required
+def get_my_transactions():
+    user_id = g.user_id
+
+    # Get the authenticated user's collection address (cached, it never changes)
+    address = collection_address(user_id)
+    if not address:
+        print(f"User with ID {user_id} not found or has no collection address for fetching transactions")
+        return jsonify([]), 200 # Return empty list if user or collection not found
+
+    # The latest transaction of each token the user currently owns, found through
+    # the ownership projection's owner index
+    user_owned_tokens = db.session.query(Transaction).join(
+        TokenOwnership, TokenOwnership.last_transaction_id == Transaction.id
+    ).filter(
+        (TokenOwnership.owner == address) &
+        TokenOwnership.status.in_(('mint', 'transferred'))
+    ).order_by(Transaction.timestamp.desc())
+
+    fields = requested_fields(Transaction)
+    user_owned_tokens = Transaction.load_fields(user_owned_tokens, fields).all()
+    return jsonify([t.to_dict(fields) for t in user_owned_tokens]), 200
+
+@bp.route('/api/send-token', methods=['POST'])
+@login_required
+def send_token():
+    user_id = g.user_id
+
+    data = request.get_json()
+    if not data or 'recipient_address' not in data or 'token_addresses' not in data or not isinstance(data['token_addresses'], list):
+        abort(400, description="Missing recipient_address or token_addresses (as a list)")
+
+    recipient_address = data['recipient_address']
+    token_addresses = data['token_addresses']
+    print(f"Received send-token request for {len(token_addresses)} token(s) to {recipient_address}") # Add logging for received data
+
+    # Get the authenticated user's collection address
+    sender_address = collection_address(user_id)
+    if not sender_address:
+        abort(400, description="Sender user not found or has no collection address")
+
+    # Check if recipient address is valid (e.g., exists as a user collection address)
+    recipient_user = User.query.filter_by(collection_address=recipient_address).first()
+    if not recipient_user:
+        abort(400, description="Recipient address not found")
+
+    # Duplicates would transfer the same token twice
+    if len(set(token_addresses)) != len(token_addresses):
+        abort(400, description="Duplicate token addresses")
+    # Sorted, so concurrent transfers lock ownership rows in the same order
+    token_addresses = sorted(token_addresses)
+
+    # Verify that the sender currently owns every token, one query per chunk
+    validation_ids = {}
+    for offset in range(0, len(token_addresses), TOKEN_TRANSFER_CHUNK):
+        chunk = token_addresses[offset:offset + TOKEN_TRANSFER_CHUNK]
+        validation_ids.update(db.session.query(TokenOwnership.token_address, Transaction.validation_id).join(
+            Transaction, Transaction.id == TokenOwnership.last_transaction_id
+        ).filter(
+            TokenOwnership.token_address.in_(chunk),
+            TokenOwnership.owner == sender_address,
+            TokenOwnership.status.in_(('mint', 'transferred'))
+        ).all())
+    missing = [token_address for token_address in token_addresses if token_address not in validation_ids]
+    if missing:
+        # If any token is not found, not owned, or already transferred, nothing is sent
+        abort(400, description=f"Token {missing[0]} not found or not owned by sender or already transferred")
+
+    # Use a database transaction for atomicity
+    try:
+        # Only move tokens the sender still owns: a concurrent transfer that
+        # committed first leaves fewer rows to update, and this one is refused
+        # (one statement per chunk, as drivers don't all report executemany rowcounts)
+        moved = sum(db.session.execute(TRANSFER_TOKEN_OWNERSHIP, {
+            'token_addresses': token_addresses[offset:offset + TOKEN_TRANSFER_CHUNK],
+            'sender': sender_address,
+            'receiver': recipient_address
+        }).rowcount for offset in range(0, len(token_addresses), TOKEN_TRANSFER_CHUNK))
+        if moved == len(token_addresses):
+            # Transactions are append-only, the previous owner loses the token
+            # through the ownership projection
+            now = datetime.now(timezone.utc)
+            after_id = db.session.query(db.func.max(Transaction.id)).scalar() or 0
+            db.session.execute(Transaction.__table__.insert(), [{
+                'validation_id': validation_ids[token_address], # Link to the original validation
+                'token_address': token_address,
+                'timestamp': now,
+                'sender': sender_address,
+                'receiver': recipient_address,
+                'status': 'transferred' # Set status to "transferred"
+            } for token_address in token_addresses])
+            # The new rows are the only ones past after_id
+            for offset in range(0, len(token_addresses), TOKEN_TRANSFER_CHUNK):
+                db.session.execute(LINK_TOKEN_OWNERSHIP, {
+                    'token_addresses': token_addresses[offset:offset + TOKEN_TRANSFER_CHUNK],
+                    'after_id': after_id,
+                    'sender': sender_address
+                })
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to create transfer transaction: {str(e)}")
+        abort(500, description="Failed to send token")
+
+    if moved != len(token_addresses):
+        abort(409, description="Some tokens were transferred by another request, nothing was sent")
+    return jsonify({'message': f'{len(token_addresses)} token(s) sent successfully'}), 200
+
+REBUILD_TOKEN_OWNERSHIP = (
+    "INSERT INTO token_ownership (token_address, owner, status, last_transaction_id) "
+    "SELECT token_address, receiver, status, id FROM ("
+    "SELECT token_address, receiver, status, id, row_number() OVER ("
+    "PARTITION BY token_address ORDER BY timestamp DESC, id DESC) AS position FROM transactions"
+    ") latest WHERE position = 1"
+)
+
+@bp.cli.command('rebuild-token-ownership')
+def rebuild_token_ownership():
+    """Recompute the token_ownership projection from the transaction history."""
+    db.session.execute(db.delete(TokenOwnership))
+    db.session.execute(db.text(REBUILD_TOKEN_OWNERSHIP))
+    db.session.commit()
+    click.echo(f'Rebuilt ownership of {db.session.query(TokenOwnership).count()} token(s)')
@@ -0,0 +1,353 @@
+"""Database models, and the versions conditional GETs are answered from."""
+from datetime import datetime, timezone
+from flask import request, abort
+from sqlalchemy.orm import load_only
+from .extensions import db
+from .passwords import password_hasher
+
+class SerializerMixin:
+    # Output field name -> (model attributes it reads, getter)
+    serialized_fields = {}
+
+    def to_dict(self, fields=None):
+        # Only the requested fields are read, so columns left unloaded by
+        # load_fields() are never lazy-loaded
+        return {
+            name: getter(self)
+            for name, (_, getter) in self.serialized_fields.items()
+            if fields is None or name in fields
+        }
+
+    @classmethod
+    def load_fields(cls, query, fields, *extra_attributes):
+        """Load only the columns needed to serialize `fields` (None loads everything)."""
+        if fields is None:
+            return query
+        attributes = {'id', *extra_attributes}
+        for name in fields:
+            if name in cls.serialized_fields:
+                attributes.update(cls.serialized_fields[name][0])
+        return query.options(load_only(*(getattr(cls, attribute) for attribute in attributes)))
+
+def requested_fields(model, *extra_fields):
+    """Parse ?fields=a,b for `model`, or return None when every field is wanted."""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = fields - set(model.serialized_fields) - set(extra_fields)
+    if unknown:
+        abort(400, description=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+class User(SerializerMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=True) # Added in a previous migration
+    full_name = db.Column(db.Text, nullable=True)
+    bio = db.Column(db.Text, nullable=True)
+    location = db.Column(db.Text, nullable=True)
+    collection_address = db.Column(db.Text, nullable=True, index=True) # Add collection_address column
+    devices = db.relationship('Device', backref='owner', lazy=True)
+
+    serialized_fields = {
+        'id': (('id',), lambda u: u.id),
+        'username': (('username',), lambda u: u.username),
+        'email': (('email',), lambda u: u.email),
+        'full_name': (('full_name',), lambda u: u.full_name),
+        'bio': (('bio',), lambda u: u.bio),
+        'location': (('location',), lambda u: u.location),
+        'collection_address': (('collection_address',), lambda u: u.collection_address)
+    }
+
+    def set_password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        return password_hasher.verify(self.password_hash, password)
+
+# Transaction Model
+class Transaction(SerializerMixin, db.Model):
+    __tablename__ = 'transactions' # Explicitly set table name
+    id = db.Column(db.Integer, primary_key=True)
+    validation_id = db.Column(db.Integer, db.ForeignKey('validation.id'), nullable=False)
+    token_address = db.Column(db.Text, nullable=False) # Removed unique=True
+    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    sender = db.Column(db.Text, nullable=True) # Add sender column
+    receiver = db.Column(db.Text, nullable=True) # Add receiver column
+    status = db.Column(db.String(20), nullable=True) # Add status column
+
+    __table_args__ = (
+        db.Index('ix_transactions_token_address_timestamp', 'token_address', 'timestamp'),
+    )
+
+    serialized_fields = {
+        'id': (('id',), lambda t: t.id),
+        'validation_id': (('validation_id',), lambda t: t.validation_id),
+        'token_address': (('token_address',), lambda t: t.token_address),
+        'timestamp': (('timestamp',), lambda t: t.timestamp.isoformat()),
+        'sender': (('sender',), lambda t: t.sender),
+        'receiver': (('receiver',), lambda t: t.receiver),
+        'status': (('status',), lambda t: t.status)
+    }
+
+class TokenOwnership(db.Model):
+    """Current owner of every token, projected from the append-only transactions table."""
+    __tablename__ = 'token_ownership'
+    token_address = db.Column(db.Text, primary_key=True)
+    owner = db.Column(db.Text, nullable=True, index=True) # Receiver of the last transaction
+    status = db.Column(db.String(20), nullable=True) # Status of the last transaction
+    last_transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+
+UPSERT_TOKEN_OWNERSHIP = db.text(
+    "INSERT INTO token_ownership (token_address, owner, status, last_transaction_id) "
+    "VALUES (:token_address, :owner, :status, :last_transaction_id) "
+    "ON CONFLICT (token_address) DO UPDATE SET owner = excluded.owner, status = excluded.status, "
+    "last_transaction_id = excluded.last_transaction_id"
+)
+
+def record_token_transactions(transactions):
+    """Move tokens to the receivers of new transactions, in the caller's DB transaction."""
+    if not transactions:
+        return
+    db.session.flush() # Assigns the transaction ids
+    db.session.execute(UPSERT_TOKEN_OWNERSHIP, [
+        {'token_address': t.token_address, 'owner': t.receiver, 'status': t.status, 'last_transaction_id': t.id}
+        for t in transactions
+    ])
+
+# Device Model
+class Validation(SerializerMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Kept when the device is deleted, as its tokens' history
+    device_id = db.Column(db.String(80), db.ForeignKey('device.id', ondelete='SET NULL'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    status = db.Column(db.String(20), nullable=False) # 'success' or 'failure'
+    device_latitude = db.Column(db.Float)
+    device_longitude = db.Column(db.Float)
+    error_message = db.Column(db.String(200))
+    ip_address = db.Column(db.String(45)) # IPv6 max length is 45 chars
+
+    __table_args__ = (
+        db.Index('ix_validation_device_id_status_timestamp', 'device_id', 'status', 'timestamp'),
+        db.Index('ix_validation_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_validation_timestamp', 'timestamp'),
+    )
+
+    serialized_fields = {
+        'id': (('id',), lambda v: v.id),
+        'device_id': (('device_id',), lambda v: v.device_id),
+        'user_id': (('user_id',), lambda v: v.user_id),
+        'timestamp': (('timestamp',), lambda v: v.timestamp.isoformat()),
+        'status': (('status',), lambda v: v.status),
+        'location': (('device_latitude', 'device_longitude'),
+                     lambda v: [v.device_latitude, v.device_longitude] if v.device_latitude and v.device_longitude else None),
+        'error_message': (('error_message',), lambda v: v.error_message),
+        'ip_address': (('ip_address',), lambda v: v.ip_address)
+    }
+
+class Rating(SerializerMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(80), db.ForeignKey('device.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False) # 1-5 stars
+    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'user_id', name='unique_user_device_rating'),
+    )
+
+    serialized_fields = {
+        'id': (('id',), lambda r: r.id),
+        'device_id': (('device_id',), lambda r: r.device_id),
+        'user_id': (('user_id',), lambda r: r.user_id),
+        'rating': (('rating',), lambda r: r.rating),
+        'timestamp': (('timestamp',), lambda r: r.timestamp.isoformat())
+    }
+
+# --- Geohash spatial index ---
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9 # ~5m cells, stored on every Device with a location
+GEOHASH_MAX_CELLS = 64 # Upper bound on cells used to cover a bounding box
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    use_lng = True # Geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        value_range, value = (lng_range, longitude) if use_lng else (lat_range, latitude)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+def geohash_cell_size(precision):
+    # (height, width) in degrees of a geohash cell
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def geohash_prefixes_for_bbox(south, west, north, east):
+    """Geohash prefixes of the cells covering a box that does not cross the antimeridian.
+
+    Uses the finest precision that needs at most GEOHASH_MAX_CELLS cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        max_row, max_col = round(180.0 / height) - 1, round(360.0 / width) - 1
+        first_row, last_row = int((south + 90) // height), min(int((north + 90) // height), max_row)
+        first_col, last_col = int((west + 180) // width), min(int((east + 180) // width), max_col)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) <= GEOHASH_MAX_CELLS:
+            break
+
+    prefixes = set()
+    for row in range(first_row, last_row + 1):
+        for col in range(first_col, last_col + 1):
+            prefixes.add(encode_geohash(-90 + (row + 0.5) * height, -180 + (col + 0.5) * width, precision))
+    return sorted(prefixes)
+
+class Device(SerializerMixin, db.Model):
+    id = db.Column(db.String(80), primary_key=True) # Using string ID like in frontend mock
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    hashed_device_key = db.Column(db.String(256), nullable=False) # Store hashed device key
+    secret = db.Column(db.String(256), nullable=True) # TOTP secret
+    description = db.Column(db.String(200))
+    status = db.Column(db.String(10), default='active') # 'active' or 'inactive'
+    qr_refresh_time = db.Column(db.Integer, default=60)
+    max_validations = db.Column(db.Integer, default=5)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    address = db.Column(db.String(200))
+    last_validation = db.Column(db.DateTime, nullable=True)
+    image = db.Column(db.Text, nullable=True) # URL of the image in the blob store (see store_image)
+    device_address = db.Column(db.Text, nullable=True) # Add device_address column
+    geohash = db.Column(db.String(12), nullable=True, index=True) # Derived from latitude/longitude
+    # Denormalized rating aggregates, maintained on every rating write
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    serialized_fields = {
+        'id': (('id',), lambda d: d.id),
+        'device_address': (('device_address',), lambda d: d.device_address),
+        'name': (('name',), lambda d: d.name),
+        'description': (('description',), lambda d: d.description),
+        'status': (('status',), lambda d: d.status),
+        'qrRefreshTime': (('qr_refresh_time',), lambda d: d.qr_refresh_time),
+        'maxValidations': (('max_validations',), lambda d: d.max_validations),
+        'location': (('latitude', 'longitude'),
+                     lambda d: [d.latitude, d.longitude] if d.latitude is not None and d.longitude is not None else None),
+        'address': (('address',), lambda d: d.address),
+        'lastValidation': (('last_validation',), lambda d: d.last_validation.isoformat() if d.last_validation else None),
+        'image': (('image',), lambda d: d.image),
+        #'secret': "secret!", # self.secret,
+        'hashed_device_key': (('hashed_device_key',), lambda d: d.hashed_device_key)
+    }
+
+@db.event.listens_for(Device, 'before_insert')
+@db.event.listens_for(Device, 'before_update')
+def update_device_geohash(mapper, connection, device):
+    # Keep the spatial index column in step with every location write
+    if device.latitude is not None and device.longitude is not None:
+        device.geohash = encode_geohash(device.latitude, device.longitude)
+    else:
+        device.geohash = None
+
+# --- Data versions ---
+
+class DataVersion(db.Model):
+    # Counter bumped in the same transaction as every write to the data a
+    # cached representation depends on; shared by all worker processes
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(200), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+BUMP_DATA_VERSION = db.text(
+    "INSERT INTO data_version (name, version) VALUES (:name, 1) "
+    "ON CONFLICT (name) DO UPDATE SET version = data_version.version + 1"
+)
+
+# The validations list of a user is versioned by username, while a new
+# Validation only knows its user's id
+BUMP_USER_VALIDATIONS_VERSION = db.text(
+    "INSERT INTO data_version (name, version) "
+    "SELECT 'user-validations:' || username, 1 FROM \"user\" WHERE id = :user_id "
+    "ON CONFLICT (name) DO UPDATE SET version = data_version.version + 1"
+)
+
+def data_version(name):
+    # Read once per request, so a conditional GET's ETag and its response
+    # cache key (see ResponseCache.cached) agree; only GET views read versions
+    versions = request.environ.setdefault('geoproof.data_versions', {})
+    if name not in versions:
+        version = db.select(DataVersion.version).filter_by(name=name).scalar_subquery()
+        if name == 'devices':
+            # recentValidations and lastValidation change with every successful
+            # validation, but bumping one shared row in each would make all
+            # validation writers wait on its lock; the newest validation id
+            # (a primary key lookup, failed attempts included) is part of the
+            # version instead
+            newest_validation = db.select(db.func.max(Validation.id)).scalar_subquery()
+            row = db.session.query(version, newest_validation).one()
+            versions[name] = f"{row[0] or 0}.{row[1] or 0}"
+        else:
+            versions[name] = db.session.query(version).scalar() or 0
+    return versions[name]
+
+def changed_version_names(session):
+    names = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Device):
+            names.update(('devices', f'device:{obj.id}', f'ratings:{obj.id}'))
+        elif isinstance(obj, Rating):
+            names.update(('devices', f'ratings:{obj.device_id}'))
+        elif isinstance(obj, User):
+            names.add(f'user:{obj.username}')
+    return names
+
+@db.event.listens_for(db.session, 'before_flush')
+def bump_data_versions(session, flush_context, instances):
+    bump_data_version(*changed_version_names(session), session=session)
+    user_ids = {obj.user_id for obj in session.new if isinstance(obj, Validation)}
+    if user_ids:
+        connection = session.connection()
+        for user_id in sorted(user_ids):
+            connection.execute(BUMP_USER_VALIDATIONS_VERSION, {'user_id': user_id})
+
+def bump_data_version(*names, session=None):
+    # For writes that bypass the unit of work (bulk UPDATEs)
+    connection = (session or db.session).connection()
+    for name in sorted(names): # Sorted to keep lock order stable
+        connection.execute(BUMP_DATA_VERSION, {'name': name})
+
+# --- Revoked tokens ---
+
+class RevokedToken(db.Model):
+    # Append-only, workers refresh from `revoked_at`; rows are purged once
+    # the token would have expired anyway
+    __tablename__ = 'revoked_token'
+    __table_args__ = {'sqlite_autoincrement': True} # Never reuse the id of a purged row
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(32), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, index=True)
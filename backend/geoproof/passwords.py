@@ -0,0 +1,46 @@
+"""Password hashing off the request threads."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """Runs werkzeug's deliberately slow password hashing in a bounded thread pool.
+
+    hashlib releases the GIL while it hashes, so the pool's size caps the
+    cores logins can use in a worker process. Requests wait for the pool,
+    but at most PASSWORD_HASH_QUEUE_SIZE of them; beyond that hashing
+    raises PasswordHasherBusy rather than queueing without bound.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE_SIZE'])
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # Werkzeug stores the full method, e.g. 'pbkdf2:sha256:600000$salt$hash'
+        return password_hash.split('$', 1)[0] != self.method
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,63 @@
+"""The user's own profile and public profiles."""
+from flask import Blueprint, jsonify, abort, request
+from .auth import login_required, current_user
+from .caching import response_cache, conditional
+from .extensions import db
+from .models import User, Validation, requested_fields
+from .validation import stream_validations
+
+bp = Blueprint('profiles', __name__)
+
+@bp.route('/api/profile', methods=['GET'])
+@login_required
+def get_profile():
+    user = current_user()
+    if not user:
+        abort(404, description="User not found")
+
+    return jsonify(user.to_dict()), 200
+
+@bp.route('/api/profile', methods=['PUT'])
+@login_required
+def update_profile():
+    user = current_user()
+    if not user:
+        abort(404, description="User not found")
+
+    data = request.get_json()
+    if not data:
+        abort(400, description="Invalid JSON data")
+
+    user.full_name = data.get('full_name', user.full_name)
+    user.bio = data.get('bio', user.bio)
+    user.location = data.get('location', user.location)
+    # Email and username are not editable here for simplicity
+
+    db.session.commit()
+    response_cache.invalidate(f'user:{user.username}')
+    return jsonify(user.to_dict()), 200
+
+# New endpoint for public user profiles
+@bp.route('/api/users/<string:username>', methods=['GET'])
+@conditional(lambda username: f'user:{username}')
+@response_cache.cached(lambda username: f'user:{username}', versioned=True)
+def get_user_profile(username):
+    fields = requested_fields(User)
+    user = User.load_fields(User.query.filter_by(username=username), fields).first()
+    if not user:
+        abort(404, description="User not found")
+    
+    # Return public profile data (using the existing to_dict method)
+    return jsonify(user.to_dict(fields)), 200
+
+# New endpoint for getting a user's validations by username (publicly accessible)
+@bp.route('/api/users/<string:username>/validations', methods=['GET'])
+@conditional(lambda username: f'user-validations:{username}')
+@response_cache.cached(lambda username: f'user-validations:{username}', versioned=True)
+def get_user_validations(username):
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        abort(404, description="User not found")
+    
+    # Return the validations for this user
+    return stream_validations(Validation.query.filter_by(user_id=user.id)), 200
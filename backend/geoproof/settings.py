@@ -0,0 +1,90 @@
+"""Configuration: the environment's config file, then defaults for every setting."""
+import os
+from dotenv import load_dotenv
+
+def load_settings(app, overrides=None):
+    """Fill `app.config`; `overrides` take precedence over the config file and environment."""
+    load_dotenv()
+    # Load environment-specific config
+    if os.environ.get('FLASK_ENV') == 'production':
+        app.config.from_pyfile('config.production.py', silent=True)
+    else:
+        app.config.from_pyfile('config.development.py', silent=True)
+
+    # Allow the database to be overridden from the environment (see README)
+    if os.environ.get('DATABASE_URI'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URI']
+    app.config.update(overrides or {})
+
+    # Set default config values if not specified
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///auth.db')
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
+        # Hosting providers still hand out the scheme SQLAlchemy no longer accepts
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql+psycopg2://' + app.config['SQLALCHEMY_DATABASE_URI'][len('postgres://'):]
+    # Connection pool per worker for client/server databases (PostgreSQL)
+    app.config.setdefault('DATABASE_POOL_SIZE', 10)
+    app.config.setdefault('DATABASE_MAX_OVERFLOW', 20)
+    app.config.setdefault('DATABASE_POOL_TIMEOUT', 30) # Seconds to wait for a free connection
+    app.config.setdefault('DATABASE_POOL_RECYCLE', 1800) # Seconds; below typical server/proxy idle timeouts
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        engine_options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+        engine_options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+        engine_options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+        engine_options.setdefault('pool_recycle', app.config['DATABASE_POOL_RECYCLE'])
+        engine_options.setdefault('pool_pre_ping', True) # Replace connections the server closed
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    app.config.setdefault('SECRET_KEY', 'fallback-secret-key')
+    app.config.setdefault('IMAGE_STORE_PATH', os.path.join(app.instance_path, 'images'))
+    # 'memory' (per process), 'sqlite' (shared by all workers on the host) or 'null'
+    app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+    app.config.setdefault('RESPONSE_CACHE_PATH', os.path.join(app.instance_path, 'response_cache.db'))
+    app.config.setdefault('RESPONSE_CACHE_TTL', 30) # Seconds
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024) # Memory backend only
+    app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 1024 * 1024) # Larger bodies are not cached
+    # Used TOTP codes: 'memory' (per process) or 'sqlite' (shared by all workers on the host)
+    app.config.setdefault('REPLAY_CACHE_BACKEND', 'memory')
+    app.config.setdefault('REPLAY_CACHE_PATH', os.path.join(app.instance_path, 'replay_cache.db'))
+    # Validation rate limit counters, with the same choice of backends
+    app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+    app.config.setdefault('RATE_LIMIT_PATH', os.path.join(app.instance_path, 'rate_limit.db'))
+    app.config.setdefault('VALIDATION_USER_RATE_LIMIT', 60) # Attempts per user per minute; each code of a batch is one
+    # Share of writes to the SQLite caches and counters, and of token revocations,
+    # that also delete the rows which have expired
+    app.config.setdefault('EXPIRED_ROW_PURGE_PROBABILITY', 0.01)
+    # Failed validation attempts are written behind the response, in batches
+    app.config.setdefault('VALIDATION_AUDIT_QUEUE_SIZE', 10000) # Beyond this, requests write synchronously
+    app.config.setdefault('VALIDATION_AUDIT_BATCH_SIZE', 500)
+    app.config.setdefault('VALIDATION_AUDIT_FLUSH_INTERVAL', 0.5) # Seconds
+    # Connection pragmas for SQLite databases; None leaves SQLite's default
+    app.config.setdefault('SQLITE_JOURNAL_MODE', 'WAL') # Readers don't block the writer
+    app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL') # Durable across crashes of the app; safe with WAL
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT', 5000) # Milliseconds to wait for a lock
+    app.config.setdefault('SQLITE_CACHE_SIZE', -20000) # Pages, or KiB when negative
+    app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024) # Bytes
+    # Off by default: failed validations reference device ids that may not exist
+    app.config.setdefault('SQLITE_FOREIGN_KEYS', False)
+    app.config.setdefault('SQLITE_MAINTENANCE_INTERVAL', 300) # Seconds between WAL checkpoints; 0 disables
+    # Seconds a token revoked in one worker may still be accepted by the others
+    app.config.setdefault('TOKEN_DENYLIST_REFRESH_INTERVAL', 1.0)
+    # Seconds of revocations each refresh reads again, for ones that committed late
+    app.config.setdefault('TOKEN_DENYLIST_REFRESH_MARGIN', 30.0)
+    # /api/validation-events: each worker polls the validations table for new events
+    app.config.setdefault('VALIDATION_EVENT_POLL_INTERVAL', 1.0) # Seconds
+    # Under WSGI a stream holds a worker thread, so it ends after this long (below
+    # gunicorn's 30 s timeout) and the client reconnects; 0 or None never ends it
+    app.config.setdefault('VALIDATION_EVENT_WSGI_STREAM_SECONDS', 25)
+    # Threads running Flask handlers in each ASGI process (see asgi.py)
+    app.config.setdefault('ASGI_THREADS', 16)
+    # Password hashes are computed in a small pool per process, so a burst of
+    # logins can't take the CPU from other requests
+    app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000') # Older hashes are upgraded on login
+    app.config.setdefault('PASSWORD_HASH_WORKERS', 1)
+    app.config.setdefault('PASSWORD_HASH_QUEUE_SIZE', 16) # Waiting hashes beyond this get a 503
+    # Login and registration attempts per fixed window, counted in the RATE_LIMIT_BACKEND
+    app.config.setdefault('LOGIN_RATE_WINDOW', 300) # Seconds
+    app.config.setdefault('LOGIN_USERNAME_RATE_LIMIT', 10)
+    app.config.setdefault('LOGIN_ADDRESS_RATE_LIMIT', 100)
+    # Reverse proxies in front of the app that append to X-Forwarded-For (see README);
+    # behind one, the per-address limit otherwise counts every client as the proxy
+    app.config.setdefault('PROXY_FIX_X_FOR', 0)
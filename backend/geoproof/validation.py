@@ -0,0 +1,869 @@
+"""Validation of scanned codes, their history and the live event stream."""
+import asyncio
+import atexit
+import base64
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, current_app, g, request, jsonify, abort, stream_with_context
+from .auth import login_required, collection_address
+from .caching import TTLCache, response_cache
+from .counters import counter_backend, rate_limiter
+from .extensions import db
+from .models import (User, Transaction, Validation, Device, requested_fields,
+                     record_token_transactions, bump_data_version)
+
+bp = Blueprint('validation', __name__)
+
+# --- Live validation events ---
+
+class ValidationEventHub:
+    """In-process fan-out of new validations to Server-Sent Events subscribers.
+
+    Each event is serialized once on publish and kept in a ring buffer, so
+    subscribers only wait on a condition and read from memory. Events are
+    published by the process's ValidationEventFeed and their ids are
+    validation ids, so a reconnecting client resumes from its Last-Event-ID
+    on any worker while that worker still buffers it. Subscribers on an
+    asyncio event loop (see asgi.py) share one asyncio.Event per loop.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self._events = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._last_id = 0
+        self._loop_waiters = {} # event loop -> asyncio.Event set on the next publish
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def advance(self, last_id):
+        # Start after `last_id` without publishing what came before it
+        with self._condition:
+            self._last_id = max(self._last_id, last_id)
+
+    def publish(self, event_id, payload):
+        data = current_app.json.dumps(payload)
+        with self._condition:
+            self._last_id = event_id
+            self._events.append((event_id, data))
+            self._condition.notify_all()
+            loops = list(self._loop_waiters)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake_loop, loop)
+            except RuntimeError: # The loop was closed
+                with self._condition:
+                    self._loop_waiters.pop(loop, None)
+
+    def _wake_loop(self, loop):
+        # Runs on `loop`; later waiters get a fresh event
+        with self._condition:
+            event = self._loop_waiters.pop(loop, None)
+        if event is not None:
+            event.set()
+
+    def events_after(self, last_id):
+        # Ids increase monotonically, so walk back from the newest event
+        newer = []
+        for event in reversed(self._events):
+            if event[0] <= last_id:
+                break
+            newer.append(event)
+        newer.reverse()
+        return newer
+
+    def wait_for_events(self, last_id, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            return self.events_after(last_id)
+
+    async def wait_for_events_async(self, last_id, timeout):
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if self._last_id > last_id:
+                return self.events_after(last_id)
+            event = self._loop_waiters.setdefault(loop, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._condition:
+            return self.events_after(last_id)
+
+class ValidationEventFeed:
+    """Publishes validations saved by any worker to this process's hub.
+
+    Under several workers a validation is saved by whichever one handled
+    the request, so the hub can't be fed from the request itself. Instead
+    one thread per process, started by the first subscriber, reads the
+    validations with an id above the last one published every
+    VALIDATION_EVENT_POLL_INTERVAL seconds, however many clients listen.
+    On PostgreSQL a validation whose id was assigned before a later one's
+    but committed after that one's poll is not published.
+    """
+
+    def __init__(self, hub, app=None):
+        self.hub = hub
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['VALIDATION_EVENT_POLL_INTERVAL']
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                # Subscribers only receive validations saved from now on
+                self.hub.advance(db.session.query(db.func.max(Validation.id)).scalar() or 0)
+                self._thread = threading.Thread(target=self._run, name='validation-event-feed', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Validation event poll failed: {str(e)}")  # Debug logging
+
+    def poll(self):
+        """Publish the validations saved since the last poll."""
+        with self.app.app_context():
+            while True:
+                rows = validation_events_after(self.hub.last_id).order_by(Validation.id).limit(
+                    VALIDATION_EVENT_POLL_BATCH
+                ).all()
+                for row in rows:
+                    self.hub.publish(*validation_event(*row))
+                if len(rows) < VALIDATION_EVENT_POLL_BATCH:
+                    return
+
+def validation_events_after(last_id):
+    # (Validation, username) rows with an id above `last_id`, for validation_event
+    return db.session.query(Validation, User.username).outerjoin(User, User.id == Validation.user_id).filter(
+        Validation.id > last_id
+    )
+
+def validation_event(validation, username):
+    # (event id, payload), the payload in the shape of the /api/all-validations rows
+    payload = validation.to_dict()
+    payload['username'] = username
+    return validation.id, payload
+
+class ValidationEventStream:
+    """Server-Sent Events body for one subscriber, resuming after `last_id`.
+
+    `backlog` holds serialized (id, data) events up to `last_id` that the hub
+    no longer (or never) buffered, sent first. Iterating it holds a thread, so
+    it ends after `duration` seconds and lets the client reconnect (a sync
+    gunicorn worker would otherwise be killed at its timeout); the ASGI entry
+    point iterates it asynchronously on the event loop instead, for as long
+    as the client stays connected.
+    """
+
+    def __init__(self, hub, last_id, duration=None, backlog=()):
+        self.hub = hub
+        self.last_id = last_id
+        self.duration = duration
+        self.backlog = list(backlog)
+
+    @staticmethod
+    def _format(events):
+        if not events:
+            return ': keep-alive\n\n'
+        return ''.join(f'id: {event_id}\nevent: validation\ndata: {data}\n\n' for event_id, data in events)
+
+    def __iter__(self):
+        last_id = self.last_id
+        deadline = time.monotonic() + self.duration if self.duration else None
+        yield 'retry: 3000\n\n'
+        if self.backlog:
+            yield self._format(self.backlog)
+        while True:
+            timeout = VALIDATION_EVENT_KEEPALIVE
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+            events = self.hub.wait_for_events(last_id, timeout)
+            yield self._format(events)
+            last_id = events[-1][0] if events else last_id
+
+    async def __aiter__(self):
+        last_id = self.last_id
+        yield 'retry: 3000\n\n'
+        if self.backlog:
+            yield self._format(self.backlog)
+        while True:
+            events = await self.hub.wait_for_events_async(last_id, VALIDATION_EVENT_KEEPALIVE)
+            yield self._format(events)
+            last_id = events[-1][0] if events else last_id
+
+validation_events = ValidationEventHub()
+validation_event_feed = ValidationEventFeed(validation_events)
+VALIDATION_EVENT_KEEPALIVE = 15 # Seconds between keep-alive comments on an idle stream
+VALIDATION_EVENT_POLL_BATCH = 500 # Validations read per query by the feed
+
+def validation_saved(validation):
+    # Called after every committed Validation: refresh the caches that list it
+    validations_saved([validation.to_dict()])
+
+def validations_saved(payloads):
+    # Batch form of validation_saved, taking Validation.to_dict() payloads
+    # serialized before the commit expired the rows. Subscribers are told by
+    # the ValidationEventFeed of every worker.
+    user_ids = {payload['user_id'] for payload in payloads}
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all())
+    response_cache.invalidate(*{f"user-validations:{usernames.get(user_id)}" for user_id in user_ids})
+    if any(payload['status'] == 'success' for payload in payloads):
+        response_cache.invalidate('devices') # recentValidations
+
+class ValidationAuditWriter:
+    """Write-behind queue for failed validation attempts.
+
+    Failures are only an audit trail, so instead of a commit per bad code they
+    are queued and a background thread inserts them in batches of up to
+    VALIDATION_AUDIT_BATCH_SIZE. The queue is bounded: when it is full the
+    request writes its record synchronously rather than dropping it. Whatever
+    is still queued is written when the process exits.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.queue = queue.Queue(maxsize=app.config['VALIDATION_AUDIT_QUEUE_SIZE'])
+        self.batch_size = app.config['VALIDATION_AUDIT_BATCH_SIZE']
+        self.flush_interval = app.config['VALIDATION_AUDIT_FLUSH_INTERVAL']
+        atexit.register(self.close)
+
+    def submit(self, **fields):
+        # The thread is started lazily so CLI commands and forked workers
+        # don't inherit one they never use
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self._write([fields])
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='validation-audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            self._write(batch + self._drain(self.batch_size - 1))
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            validations = [Validation(**fields) for fields in batch]
+            db.session.add_all(validations)
+            try:
+                db.session.flush()
+                payloads = [validation.to_dict() for validation in validations]
+                db.session.commit()
+            except Exception as e:
+                print(f"Failed to save {len(batch)} validation records: {str(e)}")  # Debug logging
+                db.session.rollback()
+                if len(batch) > 1:
+                    # Keep the rest of the batch when a single record is rejected, e.g.
+                    # a device id that doesn't exist where foreign keys are enforced
+                    for fields in batch:
+                        self._write([fields])
+                return
+            validations_saved(payloads)
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+    def close(self):
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+validation_audit = ValidationAuditWriter()
+
+def record_failed_validation(device_id, user_id, error_message):
+    print(f"Queued failed validation record: {error_message}")  # Debug logging
+    validation_audit.submit(
+        device_id=device_id,
+        user_id=user_id,
+        timestamp=datetime.now(timezone.utc),
+        status='failure',
+        error_message=error_message,
+        ip_address=request.remote_addr
+    )
+
+@bp.route('/api/validation-events', methods=['GET'])
+def stream_validation_events():
+    validation_event_feed.ensure_started()
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('lastEventId'))
+    try:
+        # A validation id, e.g. the newest one of a page of /api/all-validations;
+        # this worker may not have polled it yet, the events after it are sent once it has
+        last_id = int(last_event_id)
+    except (TypeError, ValueError):
+        # New subscribers only receive events from now on
+        last_id = validation_events.last_id
+
+    # What the hub has published since may predate its buffer (or the feed), so
+    # read it from the database, up to the newest VALIDATION_EVENT_POLL_BATCH
+    backlog = []
+    published_id = validation_events.last_id
+    if last_id < published_id:
+        rows = validation_events_after(last_id).filter(Validation.id <= published_id).order_by(
+            Validation.id.desc()
+        ).limit(VALIDATION_EVENT_POLL_BATCH).all()
+        for row in reversed(rows):
+            event_id, payload = validation_event(*row)
+            backlog.append((event_id, current_app.json.dumps(payload)))
+        last_id = published_id
+
+    stream = ValidationEventStream(validation_events, last_id, current_app.config['VALIDATION_EVENT_WSGI_STREAM_SECONDS'],
+                                   backlog)
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no' # Disable proxy buffering (nginx)
+    })
+
+def totp_key_bytes(secret_key):
+    # Use the raw secret key directly (no hashing needed)
+    # Pad/truncate to 32 bytes for AES
+    return secret_key.encode('utf-8').ljust(32, b'\0')[:32]
+
+def decrypt_totp(secret_key, cipher_text):
+    return decrypt_with_key(totp_key_bytes(secret_key), cipher_text)
+
+def decrypt_with_key(key_bytes, cipher_text):
+    from Crypto.Cipher import AES # Deferred until the first validation
+    from Crypto.Util.Padding import unpad
+    iv_and_ciphertext = base64.urlsafe_b64decode(cipher_text)
+    iv = iv_and_ciphertext[:16]
+    ciphertext = iv_and_ciphertext[16:]
+    cipher = AES.new(key_bytes, AES.MODE_CBC, iv)
+    plain_text = unpad(cipher.decrypt(ciphertext), AES.block_size)
+    return plain_text.decode('utf-8')
+
+# --- Validation fast path ---
+
+class DeviceCryptoState:
+    """Everything validate_totp needs from a Device, prepared once."""
+    __slots__ = ('secret', 'key_bytes', 'totp', 'device_address', 'qr_refresh_time', 'max_validations')
+
+    def __init__(self, secret, device_address, qr_refresh_time=None, max_validations=None):
+        import pyotp
+        self.secret = secret
+        self.key_bytes = totp_key_bytes(secret) if secret else None
+        self.totp = pyotp.TOTP(secret) if secret else None
+        self.device_address = device_address
+        # Column defaults for rows that predate them; 0 is a valid setting
+        self.qr_refresh_time = 60 if qr_refresh_time is None else qr_refresh_time
+        self.max_validations = 5 if max_validations is None else max_validations
+
+# Invalidated by update_device/delete_device in this process; the TTL bounds
+# how long other workers can keep using a rotated secret
+device_crypto_states = TTLCache(max_entries=10000, ttl=60)
+
+def device_crypto_state(device_id):
+    state = device_crypto_states.get(device_id)
+    if state is None:
+        row = db.session.query(
+            Device.secret, Device.device_address, Device.qr_refresh_time, Device.max_validations
+        ).filter_by(id=device_id).first()
+        if row is None:
+            return None
+        state = DeviceCryptoState(row.secret, row.device_address, row.qr_refresh_time, row.max_validations)
+        device_crypto_states.set(device_id, state)
+    return state
+
+# --- TOTP replay protection ---
+
+class ReplayGuard:
+    """Rejects TOTP codes that a user has already redeemed.
+
+    pyotp accepts a code for its whole time step, and a device keeps showing
+    the same QR for qr_refresh_time seconds, so each (device, time step, code)
+    may only be claimed once per user; how many users may share one QR is
+    up to the RateLimiter. Keys are kept until that step can no longer be
+    submitted: the end of the step plus the longer of the device's
+    qr_refresh_time and VALIDATION_BATCH_MAX_AGE, as kiosks may upload scans
+    that old.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = counter_backend(app, app.config['REPLAY_CACHE_BACKEND'],
+                                       app.config['REPLAY_CACHE_PATH'], 'used_totp_code')
+
+    def claim(self, device_id, device, totp_number, user_id, for_time=None):
+        """Record a verified code as used. Returns False if it was used before."""
+        for_time = for_time or datetime.now(timezone.utc)
+        time_step = device.totp.timecode(for_time)
+        retention = max(device.qr_refresh_time, VALIDATION_BATCH_MAX_AGE.total_seconds())
+        expires_at = (time_step + 1) * device.totp.interval + retention
+        return self.backend.acquire(f'{device_id}:{time_step}:{totp_number}:{user_id}', 1, expires_at)
+
+replay_guard = ReplayGuard()
+
+# --- Validation endpoints ---
+
+def too_many_validations(device_id, retry_after):
+    response = jsonify({
+        'status': 'failure',
+        'device_id': device_id,
+        'error_message': 'Too many validations, try again later'
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+@bp.route('/api/validate/<path:code>', methods=['GET'])
+@login_required
+def validate_totp(code):
+    # Split code into device_id and data_enc parts
+    parts = code.split('/')
+    if len(parts) != 2:
+        abort(400, description="Invalid validation code format")
+    device_id, data_enc = parts
+    print(f"Validation attempt for device {device_id}")  # Debug logging
+    
+    user_id = g.user_id
+
+    retry_after = rate_limiter.hit_user(user_id)
+    if retry_after:
+        return too_many_validations(device_id, retry_after)
+
+    device = device_crypto_state(device_id)
+    if not device:
+        print("Device not found")  # Debug logging
+        record_failed_validation(device_id, user_id, 'Device not found')
+        abort(404, description="Device not found")
+    
+    if not device.secret:
+        print("Device missing secret key")  # Debug logging
+        record_failed_validation(device_id, user_id, 'Device missing secret key')
+        abort(400, description="Device missing secret key")
+
+    retry_after = rate_limiter.device_exhausted(device_id, device)
+    if retry_after:
+        return too_many_validations(device_id, retry_after)
+
+    try:
+        print(f"Attempting decryption for device {device_id}")  # Debug logging
+        decrypted_data = decrypt_with_key(device.key_bytes, data_enc)
+        print(f"Decrypted data: {decrypted_data}")  # Debug logging
+    except Exception as e:
+        print(f"Decryption failed: {str(e)}")  # Debug logging
+        record_failed_validation(device_id, user_id, f'Decryption error: {str(e)}')
+        abort(400, description="Decryption error")
+
+    try:
+        print(f"Parsing decrypted data: {decrypted_data}")  # Debug logging
+        totp_number, esp_lat, esp_lng = decrypted_data.split('|')
+        esp_lat = float(esp_lat)
+        esp_lng = float(esp_lng)
+        print(f"Parsed TOTP: {totp_number}, Lat: {esp_lat}, Lng: {esp_lng}")  # Debug logging
+    except (ValueError, IndexError) as e:
+        print(f"Data parsing failed: {str(e)}")  # Debug logging
+        record_failed_validation(device_id, user_id, f'Invalid data format: {str(e)}')
+        abort(400, description="Invalid data format")
+
+    # Verify TOTP using the raw secret key from the secret column
+    totp = device.totp
+    print(f"Verifying TOTP. Received: {totp_number}, Time window: {totp.interval}") # More detailed logging
+    if not totp.verify(totp_number):
+        print("TOTP verification failed")  # Debug logging
+        record_failed_validation(device_id, user_id, 'Invalid TOTP')
+        # Return a failure status and message
+        return jsonify({
+            'status': 'failure',
+            'device_id': device_id,
+            'error_message': 'Invalid TOTP'
+        }), 400
+
+    if not replay_guard.claim(device_id, device, totp_number, user_id):
+        print("TOTP code already used")  # Debug logging
+        record_failed_validation(device_id, user_id, 'Code already used')
+        return jsonify({
+            'status': 'failure',
+            'device_id': device_id,
+            'error_message': 'Code already used'
+        }), 409
+
+    # Kept for batches that submit scans of the same QR later
+    retry_after = rate_limiter.hit_device(device_id, device, retention=VALIDATION_BATCH_MAX_AGE.total_seconds())
+    if retry_after:
+        return too_many_validations(device_id, retry_after)
+
+    # Create successful validation record
+    print("Creating successful validation record")  # Debug logging
+    validation = Validation(
+        device_id=device_id,
+        user_id=user_id,
+        timestamp=datetime.now(timezone.utc),
+        status='success',
+        device_latitude=esp_lat,
+        device_longitude=esp_lng,
+        ip_address=request.remote_addr
+    )
+    db.session.add(validation)
+    db.session.commit() # Commit validation to get its ID
+
+    # Update device last validation time without loading the Device row
+    Device.query.filter_by(id=device_id).update(
+        {'last_validation': datetime.now(timezone.utc)}, synchronize_session=False
+    )
+    bump_data_version(f'device:{device_id}') # 'devices' follows the newest validation id
+
+    # Create a new transaction record
+    # Get the user's collection address
+    receiver_address = collection_address(user_id)
+    if not receiver_address:
+        print(f"User with ID {user_id} not found or has no collection address")
+        # Decide how to handle this case - maybe log an error and continue without creating a transaction
+        # For now, we'll just print and continue
+        pass # Or return an error if transactions are mandatory
+
+    new_transaction = Transaction(
+        validation_id=validation.id,
+        token_address=str(uuid.uuid4()), # Generate a unique token address
+        timestamp=datetime.now(timezone.utc),
+        sender=device.device_address, # Sender is the device address
+        receiver=receiver_address, # Receiver is the user's collection address
+        status='mint' # Set status to "mint" for validation transactions
+    )
+    db.session.add(new_transaction)
+    record_token_transactions([new_transaction])
+
+    try:
+        db.session.commit()
+        print("Successfully saved validation, updated device, and created transaction")  # Debug logging
+        validation_saved(validation)
+    except Exception as e:
+        print(f"Failed to save validation or transaction: {str(e)}")  # Debug logging
+        db.session.rollback()
+
+    return jsonify({
+        'status': 'success',
+        'device_id': device_id,
+        'location': [esp_lat, esp_lng],
+        'validation_id': validation.id,
+        'token_address': new_transaction.token_address # Include token address in response
+    }), 200
+
+# --- Validation history helpers ---
+
+VALIDATION_PAGE_DEFAULT = 100
+VALIDATION_PAGE_MAX = 1000
+VALIDATION_STREAM_BATCH = 500
+
+def encode_cursor(timestamp, row_id):
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeError):
+        abort(400, description="Invalid cursor")
+
+def validation_page_args():
+    # Returns (limit, cursor) when the client asked for a page, None for the full history
+    limit = request.args.get('limit')
+    before = request.args.get('before')
+    if limit is None and before is None:
+        return None
+
+    try:
+        limit = int(limit) if limit is not None else VALIDATION_PAGE_DEFAULT
+    except ValueError:
+        abort(400, description="limit must be an integer")
+    if limit < 1 or limit > VALIDATION_PAGE_MAX:
+        abort(400, description=f"limit must be between 1 and {VALIDATION_PAGE_MAX}")
+
+    return limit, decode_cursor(before) if before else None
+
+def stream_validations(query, serialize=None, extra_fields=()):
+    """Stream a Validation query as a JSON array, newest first.
+
+    With ?limit= and/or ?before=<cursor> a single keyset page on
+    (timestamp, id) is returned and the cursor for the next page is sent in
+    the X-Next-Cursor header. Without them the full history is streamed in
+    batches so the server never holds it in memory at once. ?fields=
+    restricts the serialized (and loaded) columns.
+
+    `query` yields Validation objects, or rows whose first entity is the
+    Validation when `serialize(row, fields)` adds `extra_fields`.
+    """
+    fields = requested_fields(Validation, *extra_fields)
+    if serialize is None:
+        serialize = lambda validation, fields: validation.to_dict(fields)
+        validation_of = lambda row: row
+    else:
+        validation_of = lambda row: row[0]
+    query = Validation.load_fields(query, fields, 'timestamp') # Cursors need the timestamp
+    query = query.order_by(Validation.timestamp.desc(), Validation.id.desc())
+    headers = {}
+
+    page = validation_page_args()
+    if page is None:
+        rows = query.yield_per(VALIDATION_STREAM_BATCH)
+    else:
+        limit, cursor = page
+        if cursor:
+            timestamp, row_id = cursor
+            query = query.filter(
+                (Validation.timestamp < timestamp) |
+                ((Validation.timestamp == timestamp) & (Validation.id < row_id))
+            )
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = validation_of(rows[-1])
+            headers['X-Next-Cursor'] = encode_cursor(last.timestamp.isoformat(), last.id)
+
+    def generate():
+        yield '['
+        for index, row in enumerate(rows):
+            if index:
+                yield ','
+            yield current_app.json.dumps(serialize(row, fields))
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json', headers=headers)
+
+# --- Batched validation ingestion ---
+
+VALIDATION_BATCH_MAX = 500
+VALIDATION_BATCH_MAX_AGE = timedelta(hours=1) # Oldest scanned_at accepted from offline kiosks
+
+def check_validation_code(device_id, data_enc, user_id, for_time):
+    """Decrypt and verify one code. Returns (error_message, latitude, longitude)."""
+    device = device_crypto_state(device_id)
+    if not device:
+        return 'Device not found', None, None
+    if not device.secret:
+        return 'Device missing secret key', None, None
+    if rate_limiter.device_exhausted(device_id, device, for_time.timestamp()):
+        return 'Too many validations for this QR', None, None
+    try:
+        decrypted_data = decrypt_with_key(device.key_bytes, data_enc)
+    except Exception as e:
+        return f'Decryption error: {str(e)}', None, None
+    try:
+        totp_number, esp_lat, esp_lng = decrypted_data.split('|')
+        esp_lat = float(esp_lat)
+        esp_lng = float(esp_lng)
+    except (ValueError, IndexError) as e:
+        return f'Invalid data format: {str(e)}', None, None
+    if not device.totp.verify(totp_number, for_time=for_time):
+        return 'Invalid TOTP', None, None
+    if not replay_guard.claim(device_id, device, totp_number, user_id, for_time):
+        return 'Code already used', None, None
+    # Batches may submit this QR until VALIDATION_BATCH_MAX_AGE after it was shown
+    if rate_limiter.hit_device(device_id, device, for_time.timestamp(), VALIDATION_BATCH_MAX_AGE.total_seconds()):
+        return 'Too many validations for this QR', None, None
+    return None, esp_lat, esp_lng
+
+def parse_batch_item(item, now):
+    # An item is a '<device_id>/<data_enc>' code, or {'code': ..., 'scanned_at': ISO 8601}
+    # for codes scanned offline. Returns (device_id, data_enc, scanned_at) or an error string.
+    scanned_at = now
+    if isinstance(item, dict):
+        if item.get('scanned_at'):
+            try:
+                scanned_at = datetime.fromisoformat(item['scanned_at'])
+            except (TypeError, ValueError):
+                return 'Invalid scanned_at'
+            if scanned_at.tzinfo is None:
+                scanned_at = scanned_at.replace(tzinfo=timezone.utc)
+            # Stored without its offset (SQLite drops tzinfo), so always as UTC
+            scanned_at = scanned_at.astimezone(timezone.utc)
+            if scanned_at > now or now - scanned_at > VALIDATION_BATCH_MAX_AGE:
+                return 'scanned_at out of range'
+        item = item.get('code')
+    if not isinstance(item, str) or len(item.split('/')) != 2:
+        return 'Invalid validation code format'
+    device_id, data_enc = item.split('/')
+    return device_id, data_enc, scanned_at
+
+@bp.route('/api/validate/batch', methods=['POST'])
+@login_required
+def validate_batch():
+    """Verify many scanned codes and record them in a single transaction."""
+    user_id = g.user_id
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('codes'), list):
+        abort(400, description="Missing codes (as a list)")
+    # Each code is an attempt against the user's limit, as on /api/validate,
+    # so a batch larger than the limit could never be accepted
+    batch_max = min(VALIDATION_BATCH_MAX, rate_limiter.user_limit)
+    if len(data['codes']) > batch_max:
+        abort(400, description=f"At most {batch_max} codes per batch")
+
+    # Charged for the whole batch or not at all; each code also counts against its device's QR
+    retry_after = rate_limiter.hit_user(user_id, len(data['codes']))
+    if retry_after:
+        response = jsonify({'error': 'Too many validations, try again later'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+    now = datetime.now(timezone.utc)
+    receiver_address = collection_address(user_id)
+    results = []
+    validations = []
+    minted = [] # (validation, device_id, scanned_at)
+    for index, item in enumerate(data['codes']):
+        parsed = parse_batch_item(item, now)
+        if isinstance(parsed, str):
+            # Nothing to attribute the attempt to, so it isn't recorded
+            results.append({'index': index, 'status': 'failure', 'error_message': parsed})
+            continue
+
+        device_id, data_enc, scanned_at = parsed
+        error_message, esp_lat, esp_lng = check_validation_code(device_id, data_enc, user_id, scanned_at)
+        if error_message == 'Device not found':
+            # A Validation row would reference a missing device
+            results.append({'index': index, 'device_id': device_id, 'status': 'failure', 'error_message': error_message})
+            continue
+        validation = Validation(
+            device_id=device_id,
+            user_id=user_id,
+            timestamp=scanned_at,
+            status='failure' if error_message else 'success',
+            device_latitude=esp_lat,
+            device_longitude=esp_lng,
+            error_message=error_message,
+            ip_address=request.remote_addr
+        )
+        validations.append(validation)
+        results.append({'index': index, 'device_id': device_id, 'status': validation.status,
+                        'error_message': error_message})
+        if not error_message:
+            minted.append((validation, device_id, scanned_at, len(results) - 1))
+
+    db.session.add_all(validations)
+    db.session.flush() # Assigns validation ids for the transactions below
+
+    last_validations = {}
+    transactions = []
+    for validation, device_id, scanned_at, result_index in minted:
+        transaction = Transaction(
+            validation_id=validation.id,
+            token_address=str(uuid.uuid4()), # Generate a unique token address
+            timestamp=now,
+            sender=device_crypto_state(device_id).device_address, # Sender is the device address
+            receiver=receiver_address, # Receiver is the user's collection address
+            status='mint' # Set status to "mint" for validation transactions
+        )
+        transactions.append(transaction)
+        results[result_index].update({
+            'validation_id': validation.id,
+            'location': [validation.device_latitude, validation.device_longitude],
+            'token_address': transaction.token_address
+        })
+        last_validations[device_id] = max(scanned_at, last_validations.get(device_id, scanned_at))
+    db.session.add_all(transactions)
+    record_token_transactions(transactions)
+
+    # Update device last validation times without loading the Device rows
+    for device_id, last_validation in last_validations.items():
+        Device.query.filter_by(id=device_id).update({'last_validation': last_validation}, synchronize_session=False)
+    if last_validations:
+        bump_data_version(*(f'device:{device_id}' for device_id in last_validations))
+
+    payloads = [validation.to_dict() for validation in validations]
+    try:
+        db.session.commit()
+    except Exception as e:
+        print(f"Failed to save validation batch: {str(e)}")  # Debug logging
+        db.session.rollback()
+        abort(500, description="Failed to save validation batch")
+    if payloads:
+        validations_saved(payloads)
+
+    return jsonify({
+        'results': results,
+        'succeeded': len(minted),
+        'failed': len(results) - len(minted)
+    }), 200
+
+@bp.route('/api/validations/<string:device_id>', methods=['GET'])
+@login_required
+def get_validations(device_id):
+    user_id = g.user_id
+
+    device = Device.query.get(device_id)
+    if not device:
+        abort(404, description="Device not found")
+    
+    if device.user_id != user_id:
+        abort(403, description="Not authorized to view this device's validations")
+
+    return stream_validations(Validation.query.filter_by(device_id=device_id)), 200
+
+@bp.route('/api/my-validations', methods=['GET'])
+@login_required
+def get_my_validations():
+    user_id = g.user_id
+
+    # Get all validations for this user
+    return stream_validations(Validation.query.filter_by(user_id=user_id)), 200
+
+@bp.route('/api/all-validations', methods=['GET'])
+def get_all_validations():
+    # Get all validations, ordered by timestamp descending, and join with User to get username
+    validations = db.session.query(Validation, User.username)\
+        .join(User, Validation.user_id == User.id)
+
+    # Format the results to include username
+    def serialize(row, fields):
+        validation, username = row
+        validation_dict = validation.to_dict(fields)
+        if fields is None or 'username' in fields:
+            validation_dict['username'] = username
+        return validation_dict
+
+    return stream_validations(validations, serialize, extra_fields=('username',)), 200
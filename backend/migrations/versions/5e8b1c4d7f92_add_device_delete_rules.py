@@ -0,0 +1,50 @@
+"""add ON DELETE rules to the rating and validation device foreign keys
+
+Revision ID: 5e8b1c4d7f92
+Revises: a9f3d5b2c418
+Create Date: 2026-10-17 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b1c4d7f92'
+down_revision = 'a9f3d5b2c418'
+branch_labels = None
+depends_on = None
+
+# SQLite keeps the original constraints unnamed, batch mode reflects them
+# under this convention
+naming_convention = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def device_foreign_key(table):
+    if op.get_bind().dialect.name == 'sqlite':
+        return f'fk_{table}_device_id_device'
+    return f'{table}_device_id_fkey' # PostgreSQL's default name
+
+
+def upgrade():
+    with op.batch_alter_table('rating', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(device_foreign_key('rating'), type_='foreignkey')
+        batch_op.create_foreign_key('fk_rating_device_id_device', 'device', ['device_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('validation', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.alter_column('device_id',
+               existing_type=sa.String(length=80),
+               nullable=True)
+        batch_op.drop_constraint(device_foreign_key('validation'), type_='foreignkey')
+        batch_op.create_foreign_key('fk_validation_device_id_device', 'device', ['device_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    # device_id stays nullable: validations of deleted devices still back their tokens
+    with op.batch_alter_table('validation', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('fk_validation_device_id_device', type_='foreignkey')
+        batch_op.create_foreign_key('fk_validation_device_id_device', 'device', ['device_id'], ['id'])
+
+    with op.batch_alter_table('rating', schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('fk_rating_device_id_device', type_='foreignkey')
+        batch_op.create_foreign_key('fk_rating_device_id_device', 'device', ['device_id'], ['id'])
@@ -0,0 +1,37 @@
+"""add revoked_at to revoked_token, the denylist refresh cursor
+
+Revision ID: 8c2f6a9e1d35
+Revises: 5e8b1c4d7f92
+Create Date: 2026-10-18 00:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2f6a9e1d35'
+down_revision = '5e8b1c4d7f92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revoked_at', sa.DateTime(), nullable=True))
+
+    # Workers load every unexpired row at startup, the backfilled time only orders them
+    op.execute("UPDATE revoked_token SET revoked_at = CURRENT_TIMESTAMP")
+
+    # Recreated on SQLite; keep not reusing the ids of purged rows
+    with op.batch_alter_table('revoked_token', schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.alter_column('revoked_at',
+               existing_type=sa.DateTime(),
+               nullable=False)
+        batch_op.create_index(batch_op.f('ix_revoked_token_revoked_at'), ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_token', schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_token_revoked_at'))
+        batch_op.drop_column('revoked_at')
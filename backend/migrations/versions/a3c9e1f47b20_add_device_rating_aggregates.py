@@ -0,0 +1,35 @@
+"""add denormalized rating aggregates to device
+
+Revision ID: a3c9e1f47b20
+Revises: 1fb965afadf4
+Create Date: 2026-10-17 09:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f47b20'
+down_revision = '1fb965afadf4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing ratings
+    op.execute("""
+        UPDATE device SET
+            rating_sum = (SELECT COALESCE(SUM(rating.rating), 0) FROM rating WHERE rating.device_id = device.id),
+            rating_count = (SELECT COUNT(rating.id) FROM rating WHERE rating.device_id = device.id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
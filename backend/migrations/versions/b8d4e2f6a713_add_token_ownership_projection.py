@@ -0,0 +1,46 @@
+"""add token_ownership projection of the transactions ledger
+
+Revision ID: b8d4e2f6a713
+Revises: f52a8c3e9b06
+Create Date: 2026-10-17 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4e2f6a713'
+down_revision = 'f52a8c3e9b06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_ownership',
+        sa.Column('token_address', sa.Text(), nullable=False),
+        sa.Column('owner', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('last_transaction_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['last_transaction_id'], ['transactions.id'], ),
+        sa.PrimaryKeyConstraint('token_address')
+    )
+    with op.batch_alter_table('token_ownership', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_ownership_owner'), ['owner'], unique=False)
+
+    # Backfill: the latest transaction of every token (frozen copy of
+    # REBUILD_TOKEN_OWNERSHIP in geoproof/ledger.py)
+    op.execute(
+        "INSERT INTO token_ownership (token_address, owner, status, last_transaction_id) "
+        "SELECT token_address, receiver, status, id FROM ("
+        "SELECT token_address, receiver, status, id, row_number() OVER ("
+        "PARTITION BY token_address ORDER BY timestamp DESC, id DESC) AS position FROM transactions"
+        ") latest WHERE position = 1"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('token_ownership', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_ownership_owner'))
+
+    op.drop_table('token_ownership')
@@ -0,0 +1,66 @@
+"""add indexed geohash column to device
+
+Revision ID: c7d2f08e5a41
+Revises: a3c9e1f47b20
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2f08e5a41'
+down_revision = 'a3c9e1f47b20'
+branch_labels = None
+depends_on = None
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    # Frozen copy of geoproof/models.py encode_geohash so the migration doesn't import the app
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    use_lng = True
+    while len(chars) < precision:
+        value_range, value = (lng_range, longitude) if use_lng else (lat_range, latitude)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def upgrade():
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index(batch_op.f('ix_device_geohash'), ['geohash'], unique=False)
+
+    # Backfill from existing coordinates
+    connection = op.get_bind()
+    devices = connection.execute(sa.text(
+        "SELECT id, latitude, longitude FROM device WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+    for device_id, latitude, longitude in devices:
+        connection.execute(
+            sa.text("UPDATE device SET geohash = :geohash WHERE id = :id"),
+            {'geohash': encode_geohash(latitude, longitude), 'id': device_id}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_device_geohash'))
+        batch_op.drop_column('geohash')
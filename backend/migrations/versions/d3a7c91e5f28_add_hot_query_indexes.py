@@ -0,0 +1,48 @@
+"""add indexes for the hot validation, transaction, device and user lookups
+
+Revision ID: d3a7c91e5f28
+Revises: b8d4e2f6a713
+Create Date: 2026-10-17 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7c91e5f28'
+down_revision = 'b8d4e2f6a713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('validation', schema=None) as batch_op:
+        batch_op.create_index('ix_validation_device_id_status_timestamp', ['device_id', 'status', 'timestamp'], unique=False)
+        batch_op.create_index('ix_validation_user_id_timestamp', ['user_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_validation_timestamp', ['timestamp'], unique=False)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_token_address_timestamp', ['token_address', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_device_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_collection_address'), ['collection_address'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_collection_address'))
+
+    with op.batch_alter_table('device', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_device_user_id'))
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_token_address_timestamp')
+
+    with op.batch_alter_table('validation', schema=None) as batch_op:
+        batch_op.drop_index('ix_validation_timestamp')
+        batch_op.drop_index('ix_validation_user_id_timestamp')
+        batch_op.drop_index('ix_validation_device_id_status_timestamp')
@@ -0,0 +1,85 @@
+"""move base64 device images into the content-addressed image store
+
+Revision ID: e41b6a9d3c17
+Revises: c7d2f08e5a41
+Create Date: 2026-10-17 14:05:00.000000
+
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b6a9d3c17'
+down_revision = 'c7d2f08e5a41'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the app's image store layout
+IMAGE_TYPES = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp'
+}
+IMAGE_DATA_URL = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+IMAGE_URL_PREFIX = '/api/images/'
+
+
+def upgrade():
+    store_path = current_app.config['IMAGE_STORE_PATH']
+    connection = op.get_bind()
+    devices = connection.execute(sa.text("SELECT id, image FROM device WHERE image LIKE 'data:%'")).fetchall()
+    for device_id, image in devices:
+        match = IMAGE_DATA_URL.match(image)
+        if not match or match.group(1) not in IMAGE_TYPES:
+            print(f"Leaving unsupported image of device {device_id} in place")
+            continue
+        try:
+            content = base64.b64decode(match.group(2), validate=True)
+        except binascii.Error:
+            print(f"Leaving undecodable image of device {device_id} in place")
+            continue
+
+        name = f"{hashlib.sha256(content).hexdigest()}.{IMAGE_TYPES[match.group(1)]}"
+        path = os.path.join(store_path, name[:2], name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+
+        connection.execute(
+            sa.text("UPDATE device SET image = :image WHERE id = :id"),
+            {'image': IMAGE_URL_PREFIX + name, 'id': device_id}
+        )
+
+
+def downgrade():
+    # Inline the stored files again as data URLs
+    store_path = current_app.config['IMAGE_STORE_PATH']
+    mime_types = {ext: mime for mime, ext in IMAGE_TYPES.items()}
+    connection = op.get_bind()
+    devices = connection.execute(sa.text(
+        "SELECT id, image FROM device WHERE image LIKE :prefix"
+    ), {'prefix': IMAGE_URL_PREFIX + '%'}).fetchall()
+    for device_id, image in devices:
+        name = image[len(IMAGE_URL_PREFIX):]
+        path = os.path.join(store_path, name[:2], name)
+        if not os.path.exists(path):
+            print(f"Image file {path} of device {device_id} is missing")
+            continue
+        with open(path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('ascii')
+        mime_type = mime_types[name.rsplit('.', 1)[1]]
+        connection.execute(
+            sa.text("UPDATE device SET image = :image WHERE id = :id"),
+            {'image': f"data:{mime_type};base64,{encoded}", 'id': device_id}
+        )
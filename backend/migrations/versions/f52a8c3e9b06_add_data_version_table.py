@@ -0,0 +1,28 @@
+"""add data_version table for conditional GET
+
+Revision ID: f52a8c3e9b06
+Revises: e41b6a9d3c17
+Create Date: 2026-10-17 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f52a8c3e9b06'
+down_revision = 'e41b6a9d3c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
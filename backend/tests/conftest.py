@@ -0,0 +1,48 @@
+"""Fixtures: the application on a fresh SQLite database for each test.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import pytest
+from backend.geoproof import create_app, db
+from backend.geoproof.auth import collection_addresses, verified_tokens
+from backend.geoproof.devices import cluster_cache
+from backend.geoproof.validation import device_crypto_states
+
+@pytest.fixture
+def config(tmp_path):
+    # Tests adjust settings by overriding this fixture or updating the dict
+    return {
+        'TESTING': True,
+        'SECRET_KEY': 'test-secret-key-of-at-least-32-bytes',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
+        'RESPONSE_CACHE_BACKEND': 'null',
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'SQLITE_MAINTENANCE_INTERVAL': 0,
+    }
+
+@pytest.fixture
+def app(config):
+    # Process-wide caches are keyed by ids that every test database reuses
+    for cache in (collection_addresses, verified_tokens, cluster_cache, device_crypto_states):
+        cache.clear()
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login(client):
+    """login(username) registers the user and returns its Authorization header."""
+    def login(username, password='password'):
+        client.post('/api/register', json={'username': username, 'password': password})
+        response = client.post('/api/login', json={'username': username, 'password': password})
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+    return login
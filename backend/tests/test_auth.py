@@ -0,0 +1,34 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from backend.geoproof import db
+from backend.geoproof.auth import TokenDenylist
+from backend.geoproof.models import RevokedToken
+
+@pytest.fixture
+def config(config):
+    config.update(PROXY_FIX_X_FOR=1, LOGIN_ADDRESS_RATE_LIMIT=2)
+    return config
+
+def test_login_limit_counts_the_forwarded_address(client):
+    def login(address):
+        return client.post('/api/login', json={'username': 'nobody', 'password': 'x'},
+                           headers={'X-Forwarded-For': address}).status_code
+
+    # All requests come from the proxy's address; the clients are told apart by the header
+    assert [login('198.51.100.1') for _ in range(3)] == [401, 401, 429]
+    assert login('198.51.100.2') == 401
+
+def test_denylist_sees_revocations_that_commit_late(app):
+    denylist = TokenDenylist(refresh_interval=0, refresh_margin=30)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    expires_at = now + timedelta(hours=1)
+    with app.app_context():
+        db.session.add(RevokedToken(id=10, jti='first', expires_at=expires_at, revoked_at=now))
+        db.session.commit()
+        assert denylist.is_revoked('first')
+
+        # Revoked before 'first' in another worker's transaction, committed after it was read
+        db.session.add(RevokedToken(id=5, jti='late', expires_at=expires_at, revoked_at=now - timedelta(seconds=2)))
+        db.session.commit()
+        assert denylist.is_revoked('late')
+        assert not denylist.is_revoked('other')
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import event
+from backend.geoproof import db
+from backend.geoproof.caching import response_cache
+from backend.geoproof.models import DataVersion, Validation
+
+@pytest.fixture
+def statements(app):
+    """SQL statements run by the database while the test runs."""
+    statements = []
+    record = lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+@pytest.fixture
+def device(client, login):
+    headers = login('owner')
+    device = {'id': 'device-1', 'name': 'Device', 'location': [48.2, 16.3], 'hashed_device_key': 'x'}
+    assert client.post('/api/devices', headers=headers, json=device).status_code == 201
+    return headers
+
+@pytest.mark.parametrize('url', ['/api/devices', '/api/devices/device-1', '/api/ratings/device-1', '/api/users/owner',
+                                 '/api/users/owner/validations'])
+def test_unchanged_poll_is_a_304_without_the_query(client, device, statements, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    statements.clear()
+    unchanged = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert unchanged.get_data() == b''
+    # Only the data version lookup; the view's queries don't run
+    assert len(statements) == 1 and 'data_version' in statements[0]
+
+def test_validations_change_the_device_list_version_without_writing_it(app, client, device):
+    first = client.get('/api/devices')
+    with app.app_context():
+        devices_version = db.session.get(DataVersion, 'devices').version
+        db.session.add(Validation(device_id='device-1', user_id=1, status='success'))
+        db.session.commit()
+        assert db.session.get(DataVersion, 'devices').version == devices_version
+
+    changed = client.get('/api/devices', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.get_json()[0]['recentValidations']
+
+def test_user_validations_follow_validations_from_other_workers(app, client, device):
+    app.config['RESPONSE_CACHE_BACKEND'] = 'memory'
+    response_cache.init_app(app)
+    first = client.get('/api/users/owner/validations')
+    assert first.get_json() == []
+
+    # Saved by another worker: this process's cache isn't invalidated
+    with app.app_context():
+        db.session.add(Validation(device_id='device-1', user_id=1, status='failure'))
+        db.session.commit()
+    changed = client.get('/api/users/owner/validations', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert len(changed.get_json()) == 1
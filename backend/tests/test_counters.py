@@ -0,0 +1,13 @@
+import time
+from backend.geoproof.counters import SQLiteCounterBackend
+
+def test_sqlite_counters_purge_expired_rows(tmp_path):
+    backend = SQLiteCounterBackend(str(tmp_path / 'counters.db'), 'counter', purge_probability=0)
+    backend.acquire('expired', 1, time.time() - 1)
+    backend.acquire('live', 1, time.time() + 60)
+    rows = lambda: {row[0] for row in backend._connection().execute("SELECT key FROM counter")}
+    assert rows() == {'expired', 'live'}
+
+    backend.purge_probability = 1
+    backend.acquire('other', 1, time.time() + 60)
+    assert rows() == {'live', 'other'}
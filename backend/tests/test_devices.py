@@ -0,0 +1,120 @@
+import math
+import random
+import pytest
+from backend.geoproof import db
+from backend.geoproof.caching import response_cache
+from backend.geoproof.devices import EARTH_RADIUS_METERS, haversine_meters
+from backend.geoproof.models import Device, Rating, User, Validation
+
+def add_devices(app, locations):
+    with app.app_context():
+        owner = User(username='owner', password_hash='x', collection_address='owner')
+        db.session.add(owner)
+        db.session.flush()
+        db.session.add_all(
+            Device(id=f'device-{i}', user_id=owner.id, name=f'Device {i}', hashed_device_key='x',
+                   latitude=latitude, longitude=longitude)
+            for i, (latitude, longitude) in enumerate(locations)
+        )
+        db.session.commit()
+
+def near(client, latitude, longitude, radius):
+    response = client.get(f'/api/devices?near={latitude},{longitude}&radius={radius}&fields=id')
+    assert response.status_code == 200
+    return {device['id'] for device in response.get_json()}
+
+def destination(latitude, longitude, bearing, distance):
+    # The point `distance` meters from (latitude, longitude) along the initial `bearing` (degrees)
+    lat1, lng1, bearing = map(math.radians, (latitude, longitude, bearing))
+    angle = distance / EARTH_RADIUS_METERS
+    lat2 = math.asin(math.sin(lat1) * math.cos(angle) + math.cos(lat1) * math.sin(angle) * math.cos(bearing))
+    lng2 = lng1 + math.atan2(math.sin(bearing) * math.sin(angle) * math.cos(lat1),
+                             math.cos(angle) - math.sin(lat1) * math.sin(lat2))
+    return math.degrees(lat2), (math.degrees(lng2) + 180) % 360 - 180
+
+def test_near_includes_the_whole_circle(app, client):
+    # The box used to be narrower than the circle away from the equator
+    locations = [destination(60, 10, bearing, 499500) for bearing in range(0, 360, 5)]
+    add_devices(app, locations)
+    assert near(client, 60, 10, 500000) == {f'device-{i}' for i in range(len(locations))}
+
+def test_near_matches_haversine(app, client):
+    rng = random.Random(5)
+    # Uniform over the sphere, plus a band near the antimeridian
+    locations = [(math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)) for _ in range(1500)]
+    locations += [(rng.uniform(-85, 85), rng.choice((-1, 1)) * rng.uniform(170, 180)) for _ in range(500)]
+    add_devices(app, locations)
+
+    for _ in range(200):
+        latitude, longitude = rng.uniform(-89, 89), rng.uniform(-180, 180)
+        radius = 10 ** rng.uniform(4, 6.9) # 10 km to ~8000 km
+        expected = {
+            f'device-{i}' for i, location in enumerate(locations)
+            if haversine_meters(latitude, longitude, *location) <= radius
+        }
+        assert near(client, latitude, longitude, radius) == expected, (latitude, longitude, radius)
+
+def test_cached_devices_follow_writes_from_other_workers(app, client):
+    app.config['RESPONSE_CACHE_BACKEND'] = 'memory'
+    response_cache.init_app(app)
+    add_devices(app, [(10, 10)])
+    first = client.get('/api/devices?fields=id')
+
+    # Another worker's write bumps the shared data version but not this process's cache
+    with app.app_context():
+        db.session.add(Device(id='device-new', user_id=1, name='New', hashed_device_key='x'))
+        db.session.commit()
+    second = client.get('/api/devices?fields=id', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert {device['id'] for device in second.get_json()} == {'device-0', 'device-new'}
+
+def test_device_validation_settings_are_checked(client, login):
+    headers = login('owner')
+    device = {'id': 'device-1', 'name': 'Device', 'location': [10, 10], 'hashed_device_key': 'x'}
+    assert client.post('/api/devices', headers=headers, json={**device, 'qrRefreshTime': 0}).status_code == 400
+    assert client.post('/api/devices', headers=headers, json={**device, 'maxValidations': -1}).status_code == 400
+    response = client.post('/api/devices', headers=headers, json={**device, 'maxValidations': 0})
+    assert response.status_code == 201
+    assert response.get_json()['maxValidations'] == 0
+    assert client.put('/api/devices/device-1', headers=headers, json={'qrRefreshTime': 0}).status_code == 400
+
+@pytest.mark.parametrize('foreign_keys', [False, True])
+def test_delete_device(app, client, login, foreign_keys):
+    app.config['SQLITE_FOREIGN_KEYS'] = foreign_keys
+    with app.app_context():
+        db.engine.dispose() # Reconnect with the pragma
+    headers = login('owner')
+    for device_id in ('unused', 'failed', 'validated'):
+        device = {'id': device_id, 'name': device_id, 'location': [10, 10], 'hashed_device_key': 'x'}
+        assert client.post('/api/devices', headers=headers, json=device).status_code == 201
+    with app.app_context():
+        db.session.add_all([Validation(device_id='failed', user_id=1, status='failure'),
+                            Validation(device_id='validated', user_id=1, status='success')])
+        db.session.commit()
+
+    # Ratings (every device has its owner's) go with the device, validations
+    # stay as the history of their tokens
+    for device_id in ('unused', 'failed', 'validated'):
+        assert client.delete(f'/api/devices/{device_id}', headers=headers).status_code == 200
+    with app.app_context():
+        assert Device.query.count() == 0
+        assert Rating.query.count() == 0
+        assert [(validation.device_id, validation.status) for validation in Validation.query.order_by(Validation.id)] \
+            == [(None, 'failure'), (None, 'success')]
+
+def test_device_foreign_keys_cascade(app, client, login):
+    app.config['SQLITE_FOREIGN_KEYS'] = True
+    with app.app_context():
+        db.engine.dispose()
+    headers = login('owner')
+    device = {'id': 'device-1', 'name': 'Device', 'location': [10, 10], 'hashed_device_key': 'x'}
+    assert client.post('/api/devices', headers=headers, json=device).status_code == 201
+    with app.app_context():
+        db.session.add(Validation(device_id='device-1', user_id=1, status='success'))
+        db.session.commit()
+        # The database applies the rules itself, e.g. to deletes from other tools
+        db.session.execute(db.text("DELETE FROM device"))
+        db.session.commit()
+        assert Rating.query.count() == 0
+        assert [validation.device_id for validation in Validation.query] == [None]
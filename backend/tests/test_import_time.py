@@ -0,0 +1,10 @@
+"""The import time budgets of backend/benchmarks/import_time.py, as part of the suite."""
+import pytest
+from backend.benchmarks.import_time import CASES, LAZY_MODULES, best_profile
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_entry_point_imports_within_budget(name):
+    code, budget = CASES[name]
+    total, modules = best_profile(code)
+    assert total <= budget, f"{name}: {total:.1f} ms of imports, budget {budget} ms"
+    assert not [module for module in LAZY_MODULES if module in modules]
@@ -0,0 +1,43 @@
+import sqlite3
+import uuid
+import pytest
+from backend.geoproof import create_app, db
+from backend.geoproof.models import User, Device, Validation, Transaction, TokenOwnership, record_token_transactions
+
+def test_send_token_links_ownership_to_the_transfer(app, client, login):
+    sender_auth = login('sender')
+    login('recipient')
+    with app.app_context():
+        sender = User.query.filter_by(username='sender').one()
+        recipient = User.query.filter_by(username='recipient').one()
+        db.session.add(Device(id='dev0', user_id=sender.id, name='dev0', hashed_device_key='key'))
+        validation = Validation(device_id='dev0', user_id=sender.id, status='success')
+        db.session.add(validation)
+        db.session.flush()
+        mints = [Transaction(validation_id=validation.id, token_address=str(uuid.uuid4()), sender='dev0-address',
+                             receiver=sender.collection_address, status='mint') for _ in range(3)]
+        db.session.add_all(mints)
+        record_token_transactions(mints)
+        db.session.commit()
+        token_addresses = [mint.token_address for mint in mints]
+        sender_address, recipient_address = sender.collection_address, recipient.collection_address
+
+    response = client.post('/api/send-token', headers=sender_auth, json={
+        'recipient_address': recipient_address,
+        'token_addresses': token_addresses[:2]
+    })
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    with app.app_context():
+        for ownership in TokenOwnership.query.all():
+            transaction = db.session.get(Transaction, ownership.last_transaction_id)
+            assert transaction.token_address == ownership.token_address
+            if ownership.token_address in token_addresses[:2]:
+                assert (ownership.owner, transaction.status) == (recipient_address, 'transferred')
+            else:
+                assert (ownership.owner, transaction.status) == (sender_address, 'mint')
+
+def test_old_sqlite_is_refused(config, monkeypatch):
+    monkeypatch.setattr(sqlite3, 'sqlite_version_info', (3, 22, 0))
+    with pytest.raises(RuntimeError, match='3.24.0'):
+        create_app(config)
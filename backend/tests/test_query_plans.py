@@ -0,0 +1,75 @@
+"""EXPLAIN QUERY PLAN of the hot queries: the indexes added for them are used."""
+import re
+import pytest
+from sqlalchemy import event
+from backend.geoproof import db
+from backend.geoproof.auth import create_token
+from backend.geoproof.models import User, Device, Validation, Rating, Transaction, record_token_transactions
+
+SCAN = re.compile(r'^SCAN (\w+)(?! USING (?:COVERING )?INDEX)')
+
+@pytest.fixture
+def auth(app):
+    with app.app_context():
+        owner = User(username='owner', password_hash='x', collection_address='owner-collection')
+        other = User(username='other', password_hash='x', collection_address='other-collection')
+        db.session.add_all([owner, other])
+        db.session.flush()
+        for i in range(20):
+            device_id = f'dev{i}'
+            db.session.add(Device(id=device_id, user_id=owner.id, name=device_id, hashed_device_key='key',
+                                  device_address=f'{device_id}-address', latitude=48.0 + i / 100,
+                                  longitude=16.0 + i / 100, rating_sum=5, rating_count=1))
+            db.session.add(Rating(device_id=device_id, user_id=owner.id, rating=5))
+            validation = Validation(device_id=device_id, user_id=owner.id, status='success')
+            db.session.add(validation)
+            db.session.flush()
+            mint = Transaction(validation_id=validation.id, token_address=f'token{i}', sender=f'{device_id}-address',
+                               receiver=owner.collection_address, status='mint')
+            db.session.add(mint)
+            record_token_transactions([mint])
+        db.session.commit()
+        return {'Authorization': f'Bearer {create_token(owner.id)}'}
+
+@pytest.fixture
+def plans(app, client, auth):
+    """plans(method, url, body) calls the endpoint and returns the plan steps of its SELECTs and UPDATEs."""
+    def plans(method, url, body=None):
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+                statements.append((statement, parameters[0] if executemany else parameters))
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record_statement)
+            try:
+                response = client.open(url, method=method, headers=auth, json=body)
+                response.get_data()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record_statement)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            with db.engine.connect() as connection:
+                return [row[-1] for statement, parameters in statements
+                        for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    return plans
+
+@pytest.mark.parametrize('method, url, body, index', [
+    ('GET', '/api/devices', None, 'ix_validation_device_id_status_timestamp'),
+    ('GET', '/api/my-devices', None, 'ix_device_user_id'),
+    ('GET', '/api/validations/dev1', None, 'ix_validation_device_id_status_timestamp'),
+    ('GET', '/api/my-validations', None, 'ix_validation_user_id_timestamp'),
+    ('GET', '/api/users/owner/validations', None, 'ix_validation_user_id_timestamp'),
+    ('GET', '/api/all-validations?limit=10', None, 'ix_validation_timestamp'),
+    ('GET', '/api/my-transactions', None, 'ix_token_ownership_owner'),
+    ('POST', '/api/send-token', {'recipient_address': 'other-collection', 'token_addresses': ['token1', 'token2']},
+     'ix_user_collection_address'),
+    ('POST', '/api/send-token', {'recipient_address': 'other-collection', 'token_addresses': ['token1', 'token2']},
+     'ix_transactions_token_address_timestamp'),
+])
+def test_hot_queries_use_their_index(plans, method, url, body, index):
+    steps = plans(method, url, body)
+    assert any(re.search(rf'INDEX {index}\b', step) for step in steps), steps
+    # Only the device list reads a whole table, by design
+    scanned = {match.group(1) for step in steps for match in [SCAN.match(step)] if match} & set(db.metadata.tables)
+    assert scanned <= ({'device'} if url == '/api/devices' else set()), steps
@@ -0,0 +1,35 @@
+import re
+import threading
+import pytest
+from backend.geoproof import db, validation
+from backend.geoproof.models import User, Validation
+
+@pytest.fixture
+def config(config):
+    config.update(VALIDATION_EVENT_POLL_INTERVAL=0.05, VALIDATION_EVENT_WSGI_STREAM_SECONDS=1)
+    return config
+
+@pytest.fixture
+def hub(app, monkeypatch):
+    # The hub and its feed live for the whole process; give each test its own
+    hub = validation.ValidationEventHub()
+    monkeypatch.setattr(validation, 'validation_events', hub)
+    monkeypatch.setattr(validation, 'validation_event_feed', validation.ValidationEventFeed(hub, app))
+    return hub
+
+def add_validations(app, count):
+    with app.app_context():
+        if not db.session.get(User, 1):
+            db.session.add(User(username='user', password_hash='x', collection_address='user'))
+        db.session.add_all(Validation(device_id='device-1', user_id=1, status='success') for _ in range(count))
+        db.session.commit()
+
+def test_stream_resumes_after_the_last_fetched_validation(app, client, hub):
+    # Saved before this worker's feed started, after the client fetched id 1
+    add_validations(app, 3)
+    response = client.get('/api/validation-events?lastEventId=1', buffered=False)
+    later = threading.Timer(0.2, add_validations, (app, 1))
+    later.start()
+    body = ''.join(chunk.decode() for chunk in response.response)
+    later.join()
+    assert [int(event_id) for event_id in re.findall(r'^id: (\d+)$', body, re.M)] == [2, 3, 4]
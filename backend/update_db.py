@@ -1,10 +1,21 @@
-from backend.app import app, db
+from backend.geoproof import create_app, db
+from backend.geoproof.extensions import init_migrate
 from datetime import datetime, timezone
+import os
 
 def update_database():
+    # Only the models and the database are needed, not the API
+    app = create_app(views=False)
     with app.app_context():
+        fresh = not db.inspect(db.engine).get_table_names()
         # Create all tables that don't exist yet
         db.create_all()
+        if fresh:
+            # A new database (e.g. PostgreSQL) already has the latest schema;
+            # record that so `flask db upgrade` only applies later migrations
+            from flask_migrate import stamp
+            init_migrate(app)
+            stamp(directory=os.path.join(os.path.dirname(__file__), 'migrations'))
         print("Database tables updated successfully")
 
 if __name__ == '__main__':
@@ -4,26 +4,53 @@ import { Card, CardContent, CardHeader, CardTitle, CardDescription, CardFooter }
 import { Pagination, PaginationContent, PaginationItem, PaginationPrevious, PaginationNext } from '@/components/ui/pagination';
 import { Clock, MapPin, Smartphone, Check, X, User } from 'lucide-react'; // Import icons
 
+const HISTORY_PAGE_SIZE = 100; // Validations per request; older ones are fetched when paging past them
+
+// One page of the history, newest first, and the cursor of the page after it
+const fetchValidationPage = async (cursor: string | null) => {
+  const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) });
+  if (cursor) {
+    params.set('before', cursor);
+  }
+  const response = await fetch(`/api/all-validations?${params}`);
+
+  if (!response.ok) {
+    throw new Error(`Error fetching validations: ${response.statusText}`);
+  }
+
+  const data: Validation[] = await response.json();
+  return { data, nextCursor: response.headers.get('X-Next-Cursor') };
+};
+
 const StreamPage: React.FC = () => {
   const [validations, setValidations] = useState<Validation[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [currentPage, setCurrentPage] = useState(1);
   const itemsPerPage = 10; // Same as ValidationDashboard
 
   useEffect(() => {
+    let events: EventSource | null = null;
+    let cancelled = false;
+
     const fetchValidations = async () => {
       try {
-        const response = await fetch('/api/all-validations');
-
-        if (!response.ok) {
-          throw new Error(`Error fetching validations: ${response.statusText}`);
+        const page = await fetchValidationPage(null);
+        if (cancelled) {
+          return;
         }
+        setValidations(page.data);
+        setNextCursor(page.nextCursor);
 
-        const data: Validation[] = await response.json();
-        // The backend now sorts, but we can re-sort on the frontend just in case
-        data.sort((a, b) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime());
-        setValidations(data);
+        // Receive new validations as they happen instead of re-fetching the history,
+        // resuming after the newest one fetched so none saved in between is missed
+        const lastId = page.data.reduce((max, v) => Math.max(max, v.id), 0);
+        events = new EventSource(`/api/validation-events?lastEventId=${lastId}`);
+        events.addEventListener('validation', (event) => {
+          const validation: Validation = JSON.parse((event as MessageEvent).data);
+          setValidations(prev => prev.some(v => v.id === validation.id) ? prev : [validation, ...prev]);
+        });
       } catch (err: any) {
         setError(err.message);
       } finally {
@@ -32,8 +59,27 @@ const StreamPage: React.FC = () => {
     };
 
     fetchValidations();
+
+    return () => {
+      cancelled = true;
+      events?.close();
+    };
   }, []);
 
+  const showNextPage = async () => {
+    if (currentPage * itemsPerPage >= validations.length && nextCursor) {
+      try {
+        const page = await fetchValidationPage(nextCursor);
+        setValidations(prev => [...prev, ...page.data.filter(v => !prev.some(p => p.id === v.id))]);
+        setNextCursor(page.nextCursor);
+      } catch (err: any) {
+        setError(err.message);
+        return;
+      }
+    }
+    setCurrentPage(prev => prev + 1);
+  };
+
   if (loading) {
     return <div className="container mx-auto p-4">Loading validations...</div>;
   }
@@ -114,7 +160,7 @@ const StreamPage: React.FC = () => {
             )}
           </div>
         </CardContent>
-        {validations.length > itemsPerPage && (
+        {(validations.length > itemsPerPage || nextCursor) && (
           <CardFooter className="flex justify-center">
             <Pagination>
               <PaginationContent>
@@ -122,10 +168,10 @@ const StreamPage: React.FC = () => {
                   <PaginationPrevious onClick={() => setCurrentPage(prev => Math.max(1, prev - 1))} className={currentPage === 1 ? "pointer-events-none opacity-50" : ""} />
                 </PaginationItem>
                 <PaginationItem>
-                  <span className="px-2 py-2 text-sm">Page {currentPage} of {totalPages}</span>
+                  <span className="px-2 py-2 text-sm">Page {currentPage} of {totalPages}{nextCursor ? '+' : ''}</span>
                 </PaginationItem>
                 <PaginationItem>
-                  <PaginationNext onClick={() => setCurrentPage(prev => Math.min(totalPages, prev + 1))} className={currentPage === totalPages ? "pointer-events-none opacity-50" : ""} />
+                  <PaginationNext onClick={showNextPage} className={currentPage >= totalPages && !nextCursor ? "pointer-events-none opacity-50" : ""} />
                 </PaginationItem>
               </PaginationContent>
             </Pagination>